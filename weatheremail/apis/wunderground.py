@@ -1,4 +1,6 @@
 import asyncio
+import fcntl
+import os
 import time
 
 import yarl
@@ -15,6 +17,8 @@ class TokenBucket(object):
         # Initially issue as many tokens as the limit is
         self._tokens = self._limit = limit
         self._updated_at = time.monotonic()
+        # Calls made so far
+        self.calls = 0
 
     async def api_call(self, method, *args, **kwds):
         '''
@@ -23,13 +27,17 @@ class TokenBucket(object):
         @param method  - http method
         '''
         await self._wait_for_token()
+        self.calls += 1
         async with getattr(self._session, method)(*args, **kwds) as api_resp:
+            # Read before the connection is released, so the body can still
+            # be used after
+            await api_resp.read()
             return api_resp
 
     async def _wait_for_token(self):
         while self._tokens < 1:
             await self._add_new_tokens()
-            asyncio.sleep(0.25)
+            await asyncio.sleep(0.25)
         self._tokens -= 1
 
     async def _add_new_tokens(self):
@@ -40,6 +48,102 @@ class TokenBucket(object):
             self._updated_at = now
 
 
+class LeasedTokenBucket(TokenBucket):
+    def __init__(self, session, quota, lease=5):
+        '''
+        Token Bucket which leases its tokens from a quota shared with other
+        processes, so several clients together stay under the API limit.
+        Tokens are leased in small batches to keep the coordination with the
+        shared quota down to one round trip per batch.
+
+        @param session   - aiohttp ClientSession
+        @param quota     - shared quota, object with a lease(count) method
+                           returning how many tokens were granted and the
+                           seconds left in the window they belong to (see
+                           FileQuota and subscriptions.models.ApiQuota)
+        @param lease     - number of tokens to lease at once
+                           (defaults to: 5)
+        '''
+        self._session = session
+        self._quota = quota
+        self._lease = lease
+        self._tokens = 0
+        self.calls = 0
+        self._expires_at = time.monotonic()
+        # Created on first use, in the event loop of the caller
+        self._lock = None
+
+    def _has_token(self):
+        # Tokens are only good for the window they were leased in: once it
+        # ends, the other processes lease from a full limit again
+        if time.monotonic() >= self._expires_at:
+            self._tokens = 0
+        return self._tokens >= 1
+
+    async def _wait_for_token(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        while not self._has_token():
+            # One lease at a time, shared by every coroutine waiting for it
+            async with self._lock:
+                if not self._has_token():
+                    await self._add_new_tokens()
+        self._tokens -= 1
+
+    async def _add_new_tokens(self):
+        # Taken before leasing, so the window never ends later here than in
+        # the quota
+        now = time.monotonic()
+        granted, remaining = self._quota.lease(self._lease)
+        self._tokens += granted
+        self._expires_at = now + remaining
+        if not granted:
+            # The window is spent: no use asking the quota again before it
+            # ends. The lock is held meanwhile, so the other waiters do not
+            # ask either
+            await asyncio.sleep(max(remaining, 0.25))
+
+
+class FileQuota(object):
+    def __init__(self, path, limit):
+        '''
+        API rate limit per minute shared by the processes of a single host,
+        through a file guarded with an exclusive lock.
+        The file holds the start of the current window and the tokens
+        already leased in it.
+
+        @param path      - path of the quota file (created if missing)
+        @param limit     - api rate limit per minute
+        '''
+        self._path = path
+        self._limit = limit
+
+    def lease(self, count):
+        '''
+        Lease up to count tokens from the current window.
+
+        @param count   - number of tokens wanted
+        @return        - (number of tokens granted, 0 if the window is spent,
+                         seconds left in the window)
+        '''
+        fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            state = os.read(fd, 64).split()
+            now = time.time()
+            if len(state) == 2 and now - float(state[0]) <= 1 * 60:
+                window, used = float(state[0]), int(state[1])
+            else:
+                window, used = now, 0
+            granted = max(0, min(count, self._limit - used))
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, ('%f %i' % (window, used + granted)).encode())
+            return granted, window + 1 * 60 - now
+        finally:
+            os.close(fd)
+
+
 class WunderGroundError(Exception):
     status = 422
     description = 'an error has occured while processing'
@@ -66,7 +170,9 @@ class Client(object):
             session,
             key,
             url='http://api.wunderground.com/api',
-            limit=10):
+            limit=10,
+            quota=None,
+            lease=5):
         '''
         WunderGround API client
 
@@ -76,10 +182,26 @@ class Client(object):
                             (defaults to: 'http://api.wunderground.com/api')
         @param limit      - limit of api calls per minute
                             (defaults to: 10 (free tier))
+        @param quota      - shared quota to lease tokens from instead of the
+                            in-process limit, for running several clients
+                            at once (defaults to: None)
+        @param lease      - tokens leased at once from the shared quota
+                            (defaults to: 5)
         '''
         self._url = yarl.URL(url)
         self._key = key
-        self._session_limiter = TokenBucket(session, limit=limit)
+        if quota is None:
+            self._session_limiter = TokenBucket(session, limit=limit)
+        else:
+            self._session_limiter = LeasedTokenBucket(
+                session, quota=quota, lease=lease)
+
+    @property
+    def calls(self):
+        '''
+        Number of calls made to the API so far, failed ones included.
+        '''
+        return self._session_limiter.calls
 
     async def _req(self, method, page, params=None):
         '''
@@ -0,0 +1,176 @@
+'''
+Classification of the weather of many cities at once, to pick the subject
+(and template variant) of the weather discount email of each city.
+
+The conditions and almanac responses of wunderground are turned into
+columns, and averages, deltas and variants are computed for all the cities
+in one pass. NumPy is used when it is installed, pure Python otherwise.
+'''
+import collections
+import importlib.util
+
+# NumPy is slow to import, so it is only imported when classifying
+HAS_NUMPY = importlib.util.find_spec('numpy') is not None
+
+
+BAD, NICE, NEUTRAL = 0, 1, 2
+
+SUBJECTS = {
+    BAD: 'Not so nice out? That\'s okay, enjoy a discount on us.',
+    NICE: 'It\'s nice out! Enjoy a discount on us.',
+    NEUTRAL: 'Enjoy a discount on us',
+}
+
+THRESHOLD = 5.0
+BAD_WEATHER = ('overcast', 'rain')
+NICE_WEATHER = ('clear',)
+
+Classification = collections.namedtuple(
+    'Classification', ('average', 'delta', 'variant', 'index'))
+
+
+def columns(conditions, almanacs):
+    '''
+    Turn wunderground responses into columns, one value per city.
+    Cities whose responses miss a value or hold one that is not a number
+    are left out, so one bad response does not fail the whole batch.
+
+    @param conditions   - list of 'conditions' feature responses
+    @param almanacs     - list of 'almanac' feature responses, in the same
+                          order as conditions
+    @return             - dict of lists: feelslike_f, weather, temp_high,
+                          temp_low, and index (position in conditions of
+                          each city kept)
+    '''
+    cols = {
+        'feelslike_f': [],
+        'weather': [],
+        'temp_high': [],
+        'temp_low': [],
+        'index': [],
+    }
+    for i, (city_conditions, almanac) in enumerate(zip(conditions, almanacs)):
+        try:
+            today = city_conditions['current_observation']
+            almanac = almanac['almanac']
+            row = (
+                float(today['feelslike_f']),
+                today['weather'].lower(),
+                float(almanac['temp_high']['normal']['F']),
+                float(almanac['temp_low']['normal']['F']),
+            )
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+        cols['feelslike_f'].append(row[0])
+        cols['weather'].append(row[1])
+        cols['temp_high'].append(row[2])
+        cols['temp_low'].append(row[3])
+        cols['index'].append(i)
+    return cols
+
+
+def classify(
+        conditions,
+        almanacs,
+        threshold=THRESHOLD,
+        bad_weather=BAD_WEATHER,
+        nice_weather=NICE_WEATHER,
+        use_numpy=None):
+    '''
+    Classify the weather of every city.
+
+    A city is BAD when its weather is one of bad_weather or it feels at
+    least threshold degrees colder than the average, else NICE when its
+    weather is one of nice_weather or it feels at least threshold degrees
+    warmer, else NEUTRAL.
+
+    @param conditions   - list of 'conditions' feature responses
+    @param almanacs     - list of 'almanac' feature responses
+    @param threshold    - degrees F away from the average (defaults to: 5)
+    @param bad_weather  - lowercase weather descriptions classified BAD
+    @param nice_weather - lowercase weather descriptions classified NICE
+    @param use_numpy    - force (True) or avoid (False) NumPy
+                          (defaults to: None, use it when installed)
+    @return             - Classification of average, delta (feels like
+                          minus average) and variant sequences, of the
+                          cities at index in conditions (see columns)
+    '''
+    return classify_columns(
+        columns(conditions, almanacs),
+        threshold=threshold,
+        bad_weather=bad_weather,
+        nice_weather=nice_weather,
+        use_numpy=use_numpy,
+    )
+
+
+def classify_columns(
+        cols,
+        threshold=THRESHOLD,
+        bad_weather=BAD_WEATHER,
+        nice_weather=NICE_WEATHER,
+        use_numpy=None):
+    '''
+    Same as classify, for data already in columns (see columns).
+    '''
+    if use_numpy is None:
+        use_numpy = HAS_NUMPY
+    if use_numpy:
+        average, delta, variant = _classify_numpy(
+            cols, threshold, bad_weather, nice_weather)
+    else:
+        average, delta, variant = _classify_python(
+            cols, threshold, bad_weather, nice_weather)
+    index = cols.get('index')
+    if index is None:
+        index = list(range(len(cols['feelslike_f'])))
+    return Classification(average, delta, variant, index)
+
+
+def _classify_numpy(cols, threshold, bad_weather, nice_weather):
+    import numpy
+    high = numpy.asarray(cols['temp_high'], dtype=float)
+    low = numpy.asarray(cols['temp_low'], dtype=float)
+    average = (high + low) / 2
+    delta = numpy.asarray(cols['feelslike_f'], dtype=float) - average
+    # Strings are matched through a set, numpy.isin sorts object arrays
+    bad_weather = frozenset(bad_weather)
+    nice_weather = frozenset(nice_weather)
+    count = len(average)
+    bad = numpy.fromiter(
+        (w in bad_weather for w in cols['weather']), dtype=bool, count=count)
+    nice = numpy.fromiter(
+        (w in nice_weather for w in cols['weather']), dtype=bool, count=count)
+    bad |= delta <= -threshold
+    nice |= delta >= threshold
+    variant = numpy.full(count, NEUTRAL, dtype=numpy.int8)
+    variant[nice] = NICE
+    variant[bad] = BAD
+    return average, delta, variant
+
+
+def _classify_python(cols, threshold, bad_weather, nice_weather):
+    bad_weather = frozenset(bad_weather)
+    nice_weather = frozenset(nice_weather)
+    average = [
+        (high + low) / 2
+        for high, low in zip(cols['temp_high'], cols['temp_low'])
+    ]
+    delta = [
+        feelslike_f - avg
+        for feelslike_f, avg in zip(cols['feelslike_f'], average)
+    ]
+    variant = [
+        BAD if weather in bad_weather or d <= -threshold else
+        NICE if weather in nice_weather or d >= threshold else
+        NEUTRAL
+        for weather, d in zip(cols['weather'], delta)
+    ]
+    return average, delta, variant
+
+
+def subjects(variants):
+    '''
+    Email subject of each variant.
+    '''
+    return [SUBJECTS[int(v)] for v in variants]
@@ -0,0 +1,97 @@
+'''
+Build step of the email templates: stylesheets and scripts (which email
+clients ignore) and comments are dropped and whitespace is collapsed, so
+every message sent is smaller. Run with the build_templates command when
+deploying; the built templates are written to templates/build and used by
+get_template as long as they are newer than their sources.
+'''
+import os
+import re
+import tempfile
+
+import django
+
+TEMPLATES = ('weather_discount_email.html', 'thanks_email.html')
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), 'templates')
+BUILD_DIR = 'build'
+
+SCRIPT_RE = re.compile(r'<script[^>]*>.*?</script>', re.S | re.I)
+STYLESHEET_RE = re.compile(r'<link[^>]*rel=["\']stylesheet["\'][^>]*>', re.I)
+COMMENT_RE = re.compile(r'<!--(?!\[if).*?-->', re.S)
+
+
+def minify(html):
+    '''
+    Drop stylesheets, scripts and comments, and collapse whitespace.
+    Django template tags are left untouched apart from their whitespace.
+    '''
+    html = STYLESHEET_RE.sub('', html)
+    html = SCRIPT_RE.sub('', html)
+    html = COMMENT_RE.sub('', html)
+    # Only whitespace with a line break, which is indentation rather than a
+    # space between inline elements
+    html = re.sub(r'>\s*\n\s*<', '><', html)
+    html = re.sub(r'\s+', ' ', html)
+    return html.strip() + '\n'
+
+
+def build(source):
+    '''
+    Built version of an email template source.
+    '''
+    return minify(source)
+
+
+def build_all(templates=TEMPLATES, templates_dir=TEMPLATES_DIR,
+        build_dir=None):
+    '''
+    Build the email templates.
+
+    @param build_dir   - where to write them (defaults to:
+                         templates_dir/build)
+    @return            - list of (name, source size, built size)
+    '''
+    if build_dir is None:
+        build_dir = os.path.join(templates_dir, BUILD_DIR)
+    os.makedirs(build_dir, exist_ok=True)
+    sizes = []
+    for name in templates:
+        with open(os.path.join(templates_dir, name)) as fp:
+            source = fp.read()
+        built = build(source)
+        # Written aside then renamed over the old one, so a process loading
+        # it meanwhile never reads, and caches, a partly written template
+        fd, path = tempfile.mkstemp(dir=build_dir, prefix='.%s.' % (name,))
+        try:
+            with os.fdopen(fd, 'w') as fp:
+                fp.write(built)
+            os.chmod(path, 0o644)
+            os.replace(path, os.path.join(build_dir, name))
+        except BaseException:
+            os.remove(path)
+            raise
+        sizes.append((name, len(source.encode()), len(built.encode())))
+    return sizes
+
+
+def is_stale(name, templates_dir=TEMPLATES_DIR):
+    '''
+    Whether the built template is missing or older than its source.
+    '''
+    try:
+        return os.path.getmtime(
+            os.path.join(templates_dir, BUILD_DIR, name)) < (
+            os.path.getmtime(os.path.join(templates_dir, name)))
+    except OSError:
+        return True
+
+
+def get_template(name):
+    '''
+    The built email template if it is up to date, the source otherwise, so
+    editing a source takes effect before the templates are built again.
+    '''
+    if is_stale(name):
+        return django.template.loader.get_template(name)
+    return django.template.loader.get_template(
+        '%s/%s' % (BUILD_DIR, name))
@@ -2,14 +2,26 @@ from django import forms
 
 from subscriptions import models
 
-# Create a list of first 100 tuple(city.id, str(city)
-# city.id will be used to query DB
-# str(city) is shown to the user
-cities = models.City.objects.only(
-    'id',
-    'name',
-    'state').order_by('population').reverse()[:100]
-cities = [(city.id, str(city)) for city in cities]
+
+_cities = None
+
+
+def cities():
+    '''
+    Create a list of first 100 tuple(city.id, str(city)
+    city.id will be used to query DB
+    str(city) is shown to the user
+    Queried once, the first time a form is created rather than at import,
+    so importing this module does not hit the DB.
+    '''
+    global _cities
+    if _cities is None:
+        cities = models.City.objects.only(
+            'id',
+            'name',
+            'state').order_by('population').reverse()[:100]
+        _cities = [(city.id, str(city)) for city in cities]
+    return _cities
 
 
 # TODO: use some email validation tool like mailgun or other to only save
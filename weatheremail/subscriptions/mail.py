@@ -0,0 +1,124 @@
+'''
+Bulk email messages, sent as the same body to many recipients.
+
+The headers shared by every recipient and the quoted-printable body are
+encoded once into bytes; each message only adds the headers of its
+recipient (To, Date and Message-ID) in front of them.
+With the SMTP backend the bytes are written as they are to the SMTP
+connection, without building an email.message.Message per recipient.
+'''
+import email.quoprimime
+import email.utils
+import itertools
+import uuid
+
+import django
+from django.core.mail.backends.smtp import EmailBackend as SMTPBackend
+from django.core.mail.message import forbid_multi_line_headers
+from django.core.mail.utils import DNS_NAME
+
+CRLF = '\r\n'
+CHARSET = 'utf-8'
+
+
+def _header(name, value):
+    '''
+    Header value encoded like django does, folded with CRLF: smtplib sends
+    bytes as they are.
+    '''
+    return CRLF.join(
+        forbid_multi_line_headers(name, value, CHARSET)[1].splitlines())
+
+
+class BulkMessage(object):
+    '''
+    HTML email with the same subject and body for every recipient.
+
+    @param subject      - subject of the email
+    @param html         - HTML body
+    @param from_email   - sender (defaults to: DEFAULT_FROM_EMAIL)
+    '''
+
+    def __init__(self, subject, html, from_email=None):
+        self.from_email = (
+            from_email or django.conf.settings.DEFAULT_FROM_EMAIL)
+        self.subject = subject
+        self.html = html
+        self.envelope_from = django.core.mail.message.sanitize_address(
+            self.from_email, CHARSET)
+        # Unique to this message, the Message-IDs only add a counter to it
+        self._id_prefix = uuid.uuid4().hex
+        self._ids = itertools.count()
+        headers = [
+            ('From', self.from_email),
+            ('Subject', subject),
+            ('MIME-Version', '1.0'),
+            ('Content-Type', 'text/html; charset="%s"' % (CHARSET,)),
+            ('Content-Transfer-Encoding', 'quoted-printable'),
+        ]
+        self._headers = ''.join(
+            '%s: %s%s' % (name, _header(name, value), CRLF)
+            for name, value in headers
+        ).encode('ascii')
+        # Encodes characters below 256 as bytes, like email.charset does
+        self._body = email.quoprimime.body_encode(
+            html.encode(CHARSET).decode('latin-1'),
+            maxlinelen=76, eol=CRLF).encode('ascii')
+        if not self._body.endswith(b'\r\n'):
+            self._body += b'\r\n'
+
+    def message_id(self):
+        return '<%s.%i@%s>' % (
+            self._id_prefix, next(self._ids), DNS_NAME.get_fqdn())
+
+    def message(self, to):
+        '''
+        Bytes of the message to one recipient, with CRLF line endings.
+        '''
+        date = email.utils.formatdate(
+            localtime=django.conf.settings.EMAIL_USE_LOCALTIME)
+        headers = 'To: %s%sDate: %s%sMessage-ID: %s%s' % (
+            _header('To', to), CRLF,
+            date, CRLF,
+            self.message_id(), CRLF,
+        )
+        return b''.join((
+            headers.encode('ascii'),
+            self._headers,
+            b'\r\n',
+            self._body,
+        ))
+
+    def email_message(self, to, connection=None):
+        '''
+        Same message to one recipient as a django EmailMessage, for email
+        backends other than SMTP.
+        '''
+        message = django.core.mail.EmailMessage(
+            subject=self.subject,
+            body=self.html,
+            from_email=self.from_email,
+            to=[to],
+            headers={'Message-ID': self.message_id()},
+            connection=connection,
+        )
+        message.content_subtype = 'html'
+        return message
+
+    def send(self, connection, to):
+        '''
+        Send the message to one recipient through an open connection.
+
+        @param connection   - email backend, as from get_connection, opened
+        @param to           - email address of the recipient
+        '''
+        if isinstance(connection, SMTPBackend):
+            if connection.connection is None:
+                connection.open()
+            connection.connection.sendmail(
+                self.envelope_from,
+                [django.core.mail.message.sanitize_address(to, CHARSET)],
+                self.message(to),
+            )
+        else:
+            self.email_message(to, connection=connection).send()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+import random
+import time
+
+import django
+
+import subscriptions.classify
+
+
+class Command(django.core.management.base.BaseCommand):
+    help = ('Benchmark the weather classification of the weather discount '
+        'email on a batch of random cities.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size',
+            '-s',
+            dest='size',
+            default=100000,
+            type=int,
+            help='Number of cities in the batch',
+        )
+        parser.add_argument(
+            '--repeat',
+            '-r',
+            dest='repeat',
+            default=5,
+            type=int,
+            help='Number of runs, the best one is reported',
+        )
+
+    def _cities(self, size):
+        weathers = ('clear', 'overcast', 'rain', 'partly cloudy', 'snow')
+        conditions, almanacs = [], []
+        for _ in range(size):
+            conditions.append({'current_observation': {
+                'feelslike_f': '%.1f' % random.uniform(-10, 100),
+                'weather': random.choice(weathers).title(),
+            }})
+            low = random.uniform(0, 70)
+            almanacs.append({'almanac': {
+                'temp_high': {'normal': {'F': '%i' % (low + 20)}},
+                'temp_low': {'normal': {'F': '%i' % low}},
+            }})
+        return conditions, almanacs
+
+    def _best(self, repeat, func, *args, **kwds):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func(*args, **kwds)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def handle(self, *args, **options):
+        size, repeat = options['size'], options['repeat']
+        conditions, almanacs = self._cities(size)
+        cols = subscriptions.classify.columns(conditions, almanacs)
+        print('Classifying %i cities, best of %i runs' % (size, repeat))
+        print('columns:         %.4fs' % self._best(
+            repeat, subscriptions.classify.columns, conditions, almanacs))
+        modes = [('python', False)]
+        if subscriptions.classify.HAS_NUMPY:
+            modes.append(('numpy', True))
+        for name, use_numpy in modes:
+            print('%-16s %.4fs' % (name + ':', self._best(
+                repeat,
+                subscriptions.classify.classify_columns,
+                cols,
+                use_numpy=use_numpy,
+            )))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+import time
+import tracemalloc
+
+import django
+
+import subscriptions.classify
+import subscriptions.emailtemplates
+import subscriptions.mail
+from subscriptions.management.commands.bench_templates import TODAY
+
+
+class Command(django.core.management.base.BaseCommand):
+    help = ('Benchmark building the weather discount email for many '
+        'recipients, as django EmailMessage and as BulkMessage, in messages '
+        'per second and memory allocated per message.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--messages',
+            '-m',
+            dest='messages',
+            default=10000,
+            type=int,
+            help='Number of messages to build',
+        )
+
+    def _email_message(self, subject, html, recipients):
+        for to in recipients:
+            email = django.core.mail.EmailMessage(
+                subject=subject,
+                body=html,
+                from_email=django.conf.settings.DEFAULT_FROM_EMAIL,
+                to=[to],
+            )
+            email.content_subtype = 'html'
+            data = email.message().as_bytes(linesep='\r\n')
+        return data
+
+    def _bulk_message(self, subject, html, recipients):
+        message = subscriptions.mail.BulkMessage(subject=subject, html=html)
+        for to in recipients:
+            data = message.message(to)
+        return data
+
+    def _measure(self, build, subject, html, messages):
+        recipients = [
+            'subscriber-%i@example.com' % (i,) for i in range(messages)]
+        start = time.perf_counter()
+        data = build(subject, html, recipients)
+        elapsed = time.perf_counter() - start
+        # Each message is dropped before building the next, so the peak is
+        # what building one message allocates at most
+        tracemalloc.start()
+        build(subject, html, recipients[:100])
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return messages / elapsed, len(data), peak
+
+    def handle(self, *args, **options):
+        messages = options['messages']
+        subject = subscriptions.classify.SUBJECTS[subscriptions.classify.NICE]
+        html = subscriptions.emailtemplates.get_template(
+            'weather_discount_email.html').render({'today': TODAY})
+        print('Building the weather discount email for %i recipients' % (
+            messages,))
+        for title, build in (
+                ('EmailMessage:', self._email_message),
+                ('BulkMessage:', self._bulk_message)):
+            rate, size, peak = self._measure(build, subject, html, messages)
+            print('%-14s %9.1f messages/s %6i bytes, %7i bytes peak' % (
+                title, rate, size, peak))
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+import tempfile
+import time
+
+import django
+from django.template import Context, Engine
+
+import subscriptions.emailtemplates
+
+TODAY = {
+    'display_location': {'full': 'San Francisco, CA'},
+    'icon_url': 'http://icons.wxug.com/i/c/k/clear.gif',
+    'weather': 'Clear',
+    'feelslike_string': '66.3 F (19.1 C)',
+    'wind_string': 'From the WNW at 22.0 MPH Gusting to 28.0 MPH',
+    'wind_dir': 'WNW',
+}
+
+
+class Command(django.core.management.base.BaseCommand):
+    help = ('Benchmark the size and render time of the weather discount '
+        'email, from its source and built template, with and without the '
+        'cached template loader.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--messages',
+            '-m',
+            dest='messages',
+            default=2000,
+            type=int,
+            help='Number of messages to render',
+        )
+
+    def _engine(self, cached, templates_dir):
+        loaders = ['django.template.loaders.filesystem.Loader']
+        if cached:
+            loaders = [('django.template.loaders.cached.Loader', loaders)]
+        return Engine(dirs=[templates_dir], loaders=loaders)
+
+    def _render(self, engine, name, messages):
+        start = time.perf_counter()
+        for _ in range(messages):
+            html = engine.get_template(name).render(Context({'today': TODAY}))
+        return (time.perf_counter() - start) / messages, len(html.encode())
+
+    def handle(self, *args, **options):
+        messages = options['messages']
+        name = 'weather_discount_email.html'
+        source_dir = subscriptions.emailtemplates.TEMPLATES_DIR
+        print('Rendering %s %i times' % (name, messages))
+        # Built aside, not to touch the templates of the app
+        with tempfile.TemporaryDirectory() as build_dir:
+            subscriptions.emailtemplates.build_all(
+                templates=[name], build_dir=build_dir)
+            for title, templates_dir, cached in (
+                    ('source, not cached', source_dir, False),
+                    ('source, cached', source_dir, True),
+                    ('built, cached', build_dir, True)):
+                elapsed, size = self._render(
+                    self._engine(cached, templates_dir), name, messages)
+                print('%-20s %6i bytes %8.1fus per message' % (
+                    title + ':', size, elapsed * 1000000))
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+import django
+
+import subscriptions.emailtemplates
+
+
+class Command(django.core.management.base.BaseCommand):
+    help = ('Build the email templates: drop scripts, stylesheets and '
+        'comments and collapse whitespace, into '
+        'subscriptions/templates/build.')
+    requires_system_checks = False
+
+    def handle(self, *args, **options):
+        for name, source, built in subscriptions.emailtemplates.build_all():
+            if options['verbosity']:
+                print('%s: %i -> %i bytes' % (name, source, built))
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+import datetime
+
+import django
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+
+import subscriptions
+import subscriptions.partitions
+
+
+class Command(django.core.management.base.BaseCommand):
+    help = ('Roll events older than the retention window up into daily '
+        'counts, drop them, and create the partitions of the coming months.')
+    # Run from the scheduler: skip loading every app and URL to check them
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            '-r',
+            dest='retention_days',
+            default=90,
+            type=int,
+            help='Days of events to keep in the event table',
+        )
+        parser.add_argument(
+            '--ahead',
+            '-a',
+            dest='ahead',
+            default=2,
+            type=int,
+            help='Months ahead to create event partitions for',
+        )
+
+    def _roll_up(self, events):
+        '''
+        Add the events to the daily counts, per newsletter, city and subject.
+        '''
+        daily = events.annotate(day=TruncDate('date_sent')).values(
+            'day', 'newsletter', 'subscriber__city_id', 'subject',
+        ).annotate(count=Count('id')).order_by()
+        rolled_up = 0
+        for row in daily:
+            key = {
+                'day': row['day'],
+                'newsletter': row['newsletter'],
+                'city_id': row['subscriber__city_id'],
+                'subject': row['subject'],
+            }
+            updated = subscriptions.models.EventDaily.objects.filter(
+                **key).update(count=F('count') + row['count'])
+            if not updated:
+                subscriptions.models.EventDaily(
+                    count=row['count'], **key).save()
+            rolled_up += row['count']
+        return rolled_up
+
+    def _drop(self, cutoff):
+        '''
+        Drop the events sent before cutoff: whole partitions when the table
+        is partitioned, row by row for what is left.
+        '''
+        connection = django.db.connection
+        partitions = subscriptions.partitions
+        dropped = 0
+        if partitions.is_partitioned(connection):
+            with connection.cursor() as cursor:
+                for month in partitions.partitions(cursor):
+                    if partitions.next_month(month) > cutoff.date():
+                        break
+                    partitions.drop_partition(cursor, month)
+                    dropped += 1
+        deleted, _ = subscriptions.models.Event.objects.filter(
+            date_sent__lt=cutoff).delete()
+        return dropped, deleted
+
+    def _create_partitions(self, ahead):
+        connection = django.db.connection
+        if not subscriptions.partitions.is_partitioned(connection):
+            return 0
+        month = subscriptions.partitions.month_start(
+            django.utils.timezone.now())
+        with connection.cursor() as cursor:
+            for _ in range(ahead + 1):
+                subscriptions.partitions.create_partition(cursor, month)
+                month = subscriptions.partitions.next_month(month)
+        return ahead + 1
+
+    def handle(self, *args, **options):
+        now = django.utils.timezone.now()
+        # Whole days only, so a day is never split between raw events and
+        # daily counts
+        cutoff = (now - datetime.timedelta(
+            days=options['retention_days'])).date()
+        cutoff_time = datetime.datetime.combine(
+            cutoff, datetime.time(tzinfo=datetime.timezone.utc))
+        # Rolling up and dropping are done together, so events are never
+        # counted twice or lost if interrupted
+        with django.db.transaction.atomic():
+            rolled_up = self._roll_up(
+                subscriptions.models.Event.objects.filter(
+                    date_sent__lt=cutoff_time))
+            dropped, deleted = self._drop(cutoff_time)
+        created = self._create_partitions(options['ahead'])
+        if options['verbosity']:
+            print(
+                'Rolled up %i events sent before %s' % (rolled_up, cutoff),
+                '\nDropped %i partitions' % (dropped,),
+                '\nDeleted %i events' % (deleted,),
+                '\nEnsured %i partitions from this month on' % (created,),
+            )
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+import datetime
+
+import django
+
+import subscriptions
+
+
+class Command(django.core.management.base.BaseCommand):
+    help = ('Print the query plans of the queries of send_emails, '
+        'optionally seeding the DB with fake subscribers and events first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--newsletter',
+            '-n',
+            dest='newsletter',
+            default='WD',
+            help='Newsletter whose mailing queries to explain',
+        )
+        parser.add_argument(
+            '--seed',
+            '-s',
+            dest='seed',
+            default=0,
+            type=int,
+            help='Number of fake subscribers to insert before explaining',
+        )
+        parser.add_argument(
+            '--scratch-db',
+            dest='scratch_db',
+            default=None,
+            help=('Name of the DB, to confirm it is a scratch DB which can be '
+                'seeded: the fake subscribers would be sent the newsletter'),
+        )
+
+    def _bulk_create(self, model, objs, chunk=10000):
+        batch = []
+        for obj in objs:
+            batch.append(obj)
+            if len(batch) == chunk:
+                model.objects.bulk_create(batch)
+                batch = []
+        model.objects.bulk_create(batch)
+
+    def _seed(self, newsletter, count, verbosity):
+        models = subscriptions.models
+        cities = list(models.City.objects.all()[:1000])
+        if not cities:
+            models.City.objects.bulk_create(
+                models.City(
+                    name='Seed City %i' % (i,),
+                    state=subscriptions.util.STATES[i % 50][0],
+                    population=0,
+                    time_zone='UTC',
+                )
+                for i in range(100)
+            )
+            cities = list(models.City.objects.all())
+        start = models.Subscription.objects.count()
+        now = django.utils.timezone.now()
+        # One in ten unsubscribed, as in a real mailing list
+        self._bulk_create(models.Subscription, (
+            models.Subscription(
+                email='seed%i@example.com' % (i,),
+                newsletter=newsletter,
+                city=cities[i % len(cities)],
+                subscribed=i % 10 != 0,
+            ) for i in range(start, start + count)
+        ))
+        # One event per subscriber
+        subscribers = models.Subscription.objects.filter(
+            email__startswith='seed', newsletter=newsletter,
+        ).values_list('id', flat=True).order_by('-id')[:count]
+        self._bulk_create(models.Event, (
+            models.Event(
+                subscriber_id=subscriber,
+                sender=django.conf.settings.DEFAULT_FROM_EMAIL,
+                newsletter=newsletter,
+                subject='Enjoy a discount on us',
+            ) for subscriber in subscribers.iterator()
+        ))
+        # date_sent is auto_now_add, spread it over the last 30 days after
+        # inserting
+        with django.db.connection.cursor() as cursor:
+            if django.db.connection.vendor == 'postgresql':
+                cursor.execute(
+                    'UPDATE subscriptions_event '
+                    'SET date_sent = %s - (id %% 30) * interval \'1 day\' '
+                    'WHERE date_sent >= %s',
+                    [now, now])
+                # As autovacuum would have, so index only scans are possible
+                cursor.execute('VACUUM ANALYZE')
+        if verbosity:
+            print('Seeded %i subscribers and events' % (count,))
+
+    def _explain(self, title, queryset):
+        connection = django.db.connection
+        sql, params = queryset.query.sql_with_params()
+        if connection.vendor == 'postgresql':
+            explain = 'EXPLAIN (ANALYZE, BUFFERS) '
+        else:
+            explain = 'EXPLAIN QUERY PLAN '
+        with connection.cursor() as cursor:
+            cursor.execute(explain + sql, params)
+            plan = cursor.fetchall()
+        print('\n%s\n%s\n%s' % (title, '-' * len(title), sql % tuple(
+            repr(str(p)) for p in params)))
+        for row in plan:
+            print(' '.join(str(column) for column in row))
+
+    def handle(self, *args, **options):
+        newsletter = options['newsletter']
+        if options['seed']:
+            name = django.db.connection.settings_dict['NAME']
+            if options['scratch_db'] != name:
+                raise django.core.management.base.CommandError(
+                    'Refusing to seed %r: pass --scratch-db %s if it is a '
+                    'scratch DB' % (name, name))
+            self._seed(newsletter, options['seed'], options['verbosity'])
+        models = subscriptions.models
+        since = django.utils.timezone.now() - datetime.timedelta(days=1)
+        subscriber = models.Subscription.objects.filter(
+            newsletter=newsletter).values_list('id', flat=True).first()
+        self._explain(
+            'Mailing list',
+            models.Subscription.mailing_list(newsletter),
+        )
+        self._explain(
+            'Mailing list, without the subscribers sent to in the last day',
+            models.Subscription.mailing_list(
+                newsletter, not_sent_since=since),
+        )
+        self._explain(
+            'Events of a subscriber in the last day',
+            models.Event.objects.filter(
+                subscriber_id=subscriber, date_sent__gte=since),
+        )
+        self._explain(
+            'Subscribers sent to in the last day',
+            models.Event.objects.filter(
+                newsletter=newsletter, date_sent__gte=since,
+            ).values('subscriber_id'),
+        )
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+import asyncio
+import re
+import time
+import uuid
+
+import django
+
+CSRF_RE = re.compile(
+    r'name=["\']csrfmiddlewaretoken["\'] value=["\']([^"\']+)')
+CITY_RE = re.compile(r'<option value=["\'](\d+)["\']')
+
+
+class Command(django.core.management.base.BaseCommand):
+    help = ('Load test the subscription page of a running server, reporting '
+        'requests per second and latencies. Local use only: subscribing '
+        'creates subscriptions and sends emails.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            '-u',
+            dest='url',
+            default='http://localhost:8081/subscribe/',
+            help='URL of the subscription page',
+        )
+        parser.add_argument(
+            '--requests',
+            '-r',
+            dest='requests',
+            default=1000,
+            type=int,
+            help='Total number of requests',
+        )
+        parser.add_argument(
+            '--concurrency',
+            '-c',
+            dest='concurrency',
+            default=50,
+            type=int,
+            help='Number of concurrent clients',
+        )
+        parser.add_argument(
+            '--subscribe',
+            '-s',
+            dest='subscribe',
+            action='store_true',
+            help='Submit the form with new emails instead of getting the page',
+        )
+
+    async def _request(self, session, method, url, record=True, **kwds):
+        start = time.perf_counter()
+        async with getattr(session, method)(
+                url, allow_redirects=False, **kwds) as resp:
+            text = await resp.text()
+        if record:
+            self.latencies.append(time.perf_counter() - start)
+            self.statuses[resp.status] = self.statuses.get(resp.status, 0) + 1
+        return text
+
+    async def _client(self, url, requests, subscribe):
+        # Imported here, as it is slow to import
+        import aiohttp
+        # Each client has its own cookies, like a browser. Unsafe to keep
+        # cookies of IP address hosts, like 127.0.0.1
+        cookie_jar = aiohttp.CookieJar(unsafe=True)
+        async with aiohttp.ClientSession(cookie_jar=cookie_jar) as session:
+            if subscribe:
+                page = await self._request(
+                    session, 'get', url, record=False)
+                token = CSRF_RE.search(page).group(1)
+                cities = CITY_RE.findall(page)
+            for i in range(requests):
+                if not subscribe:
+                    await self._request(session, 'get', url)
+                    continue
+                await self._request(session, 'post', url, data={
+                    'csrfmiddlewaretoken': token,
+                    'email': 'loadtest-%s@example.com' % (uuid.uuid4().hex,),
+                    'city': cities[i % len(cities)],
+                }, headers={'Referer': url})
+
+    def handle(self, *args, **options):
+        self.statuses = {}
+        self.latencies = []
+        total, concurrency = options['requests'], options['concurrency']
+        per_client = [total // concurrency] * concurrency
+        for i in range(total % concurrency):
+            per_client[i] += 1
+        loop = asyncio.get_event_loop()
+        start = time.perf_counter()
+        loop.run_until_complete(asyncio.gather(*(
+            self._client(options['url'], requests, options['subscribe'])
+            for requests in per_client if requests
+        )))
+        elapsed = time.perf_counter() - start
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+        print(
+            '%i requests in %.2fs, concurrency %i' % (
+                len(latencies), elapsed, concurrency),
+            '\nRequests per second: %.1f' % (len(latencies) / elapsed,),
+            '\nLatency p50: %.1fms p90: %.1fms p99: %.1fms' % (
+                percentile(0.5) * 1000,
+                percentile(0.9) * 1000,
+                percentile(0.99) * 1000),
+            '\nStatuses: %s' % (', '.join(
+                '%i: %i' % item for item in sorted(self.statuses.items())),),
+        )
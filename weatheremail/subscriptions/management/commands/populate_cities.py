@@ -3,9 +3,7 @@
 import asyncio
 import json
 
-import aiohttp
 import django
-import googlemaps
 
 import subscriptions
 
@@ -17,6 +15,9 @@ class Command(django.core.management.base.BaseCommand):
     inserted = 0
 
     async def _populate(self, verbosity):
+        # Imported here, as they are slow to import
+        import aiohttp
+        import googlemaps
         gclient = googlemaps.Client(key=django.conf.settings.GOOGLE_KEY)
         async with aiohttp.ClientSession() as session:
             async with session.get(
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+import asyncio
+
+import django
+
+import subscriptions
+import subscriptions.weather
+
+
+class Command(django.core.management.base.BaseCommand):
+    help = ('Fetch the weather of every city with subscribers ahead of '
+        'sending, into snapshots used by send_emails --from-snapshot.')
+    # Run from the scheduler: skip loading every app and URL to check them
+    requires_system_checks = False
+    cities = 0
+    failed = 0
+    api_calls = 0
+
+    def add_arguments(self, parser):
+        subscriptions.weather.add_arguments(parser)
+        parser.add_argument(
+            '--newsletter',
+            '-n',
+            dest='newsletter',
+            default=None,
+            help=('Only the cities of the subscribers of this newsletter '
+                '(defaults to: every newsletter)'),
+        )
+
+    def _cities(self, newsletter):
+        '''
+        Distinct cities with subscribers, as (id, name, state).
+        '''
+        subscribed = subscriptions.models.Subscription.objects.filter(
+            subscribed=True)
+        if newsletter is not None:
+            subscribed = subscribed.filter(newsletter=newsletter)
+        # A semi-join on the subscriptions, so each city comes once whatever
+        # its number of subscribers
+        return list(subscriptions.models.City.objects.filter(
+            id__in=subscribed.values('city_id'),
+        ).order_by('id').values_list('id', 'name', 'state'))
+
+    async def _prefetch(self, cities, api_limit, quota, lease, concurrency,
+            verbosity):
+
+        def fetched(index, conditions, almanac):
+            city_id, name, state = cities[index]
+            # Stored as soon as fetched, so an error later on does not lose
+            # the cities already fetched
+            subscriptions.models.WeatherSnapshot.store(
+                city_id, conditions, almanac)
+            self.cities += 1
+            if verbosity:
+                print('Fetched weather of %s, %s' % (name, state))
+
+        def failed(index, error):
+            self.failed += 1
+            if verbosity:
+                print('Could not fetch the weather of %s, %s: %s' % (
+                    cities[index][1:] + (error,)))
+
+        _, _, self.api_calls = await subscriptions.weather.fetch(
+            [(name, state) for _, name, state in cities],
+            api_limit=api_limit,
+            quota=quota,
+            lease=lease,
+            concurrency=concurrency,
+            fetched=fetched,
+            failed=failed,
+        )
+
+    def handle(self, *args, **options):
+        cities = self._cities(options['newsletter'])
+        loop = asyncio.get_event_loop()
+        try:
+            loop.run_until_complete(self._prefetch(
+                cities=cities,
+                api_limit=options['api_limit'],
+                quota=subscriptions.weather.quota(
+                    kind=options['quota'],
+                    api_limit=options['api_limit'],
+                    quota_file=options['quota_file']),
+                lease=options['lease'],
+                concurrency=options['concurrency'],
+                verbosity=options['verbosity']),
+            )
+        except KeyboardInterrupt:
+            pass
+        finally:
+            print(
+                '\nShutting down asyncio event loop.',
+                '\nGot weather for %i of %i cities' % (
+                    self.cities, len(cities)),
+                '\nCould not fetch the weather of %i cities' % (self.failed,),
+                '\nMade %i calls to wunderground API' % (self.api_calls,)
+            )
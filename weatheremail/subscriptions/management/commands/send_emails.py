@@ -1,28 +1,40 @@
 #!/usr/bin/env python3
 import asyncio
+import datetime
 
-import aiohttp
 import django
 
 import subscriptions
-# insert BASE_DIR in PATH so we can import apis.wunderground
-import sys
-sys.path.insert(0, django.conf.settings.BASE_DIR)
-import apis.wunderground # noqa E402
+import subscriptions.classify
+import subscriptions.emailtemplates
+import subscriptions.mail
+import subscriptions.weather
 
 
 class Command(django.core.management.base.BaseCommand):
     help = ('Send bulk emails to all the subscribers of a newsletter')
+    # Run from the scheduler: skip loading every app and URL to check them
+    requires_system_checks = False
     sent = 0
     cities = 0
+    missing = 0
+    failed = 0
+    unclassified = 0
+    api_calls = 0
 
     def add_arguments(self, parser):
+        subscriptions.weather.add_arguments(parser)
         parser.add_argument(
-            '--api-limit',
-            '-l',
-            dest='api_limit',
-            default=10,
-            help='API call limit per minute',
+            '--window',
+            '-w',
+            dest='window',
+            # Shorter than the day between two runs: each subscriber is
+            # reached a little later than the start of the run, so a day
+            # long window would skip them on the next one
+            default=20,
+            type=float,
+            help=('Hours during which a subscriber is not sent the newsletter '
+                'again, 0 to send regardless'),
         )
         parser.add_argument(
             '--newsletter',
@@ -31,97 +43,183 @@ class Command(django.core.management.base.BaseCommand):
             default='WD',
             help='Newsletter to whose subscribers to send email',
         )
+        parser.add_argument(
+            '--from-snapshot',
+            '-s',
+            dest='from_snapshot',
+            action='store_true',
+            help=('Use the weather fetched by prefetch_weather instead of '
+                'calling the API'),
+        )
+        parser.add_argument(
+            '--max-age',
+            dest='max_age',
+            default=6,
+            type=float,
+            help=('Hours after which a snapshot is too old to be used, with '
+                '--from-snapshot'),
+        )
 
-    async def _send_bulk(self, newsletter, api_limit, verbosity):
-        async with aiohttp.ClientSession() as session:
-            subscribers = subscriptions.models.Subscription.objects.filter(
-                subscribed=True).filter(newsletter=newsletter)
-            subscr_cities = {}
-            for subscr in subscribers:
-                key = (subscr.city.name, subscr.city.state)
-                if key not in subscr_cities:
-                    subscr_cities[key] = []
-                subscr_cities[key].append(subscr)
-            wuclient = apis.wunderground.Client(
-                key=django.conf.settings.WUNDERGROUND_KEY,
-                session=session,
-            )
-            for i, k in enumerate(subscr_cities):
-                city, state = k
-                conditions = await wuclient.get(
-                    feature='conditions',
-                    query={'city': city, 'state': state},
-                )
-                today = conditions['current_observation']
-                almanac = await wuclient.get(
-                    feature='almanac',
-                    query={'city': city, 'state': state},
-                )
+    def _mailing_list(self, newsletter, window):
+        '''
+        Subscribers to send to, grouped by city.
 
-                def average(almanac):
-                    almanac = almanac['almanac']
-                    avg_high = float(almanac['temp_high']['normal']['F'])
-                    avg_low = float(almanac['temp_low']['normal']['F'])
-                    return (avg_low + avg_high) / 2
-
-                def subject():
-                    avg = average(almanac)
-                    feelslike_f = float(today['feelslike_f'])
-                    weather = today['weather'].lower()
-                    if (weather in ('overcast', 'rain')
-                            or avg - feelslike_f >= 5):
-                        return ('Not so nice out? That\'s okay, enjoy a '
-                            'discount on us.')
-                    if (weather == 'clear'
-                            or feelslike_f - avg >= 5):
-                        return 'It\'s nice out! Enjoy a discount on us.'
-                    return 'Enjoy a discount on us'
-
-                self.cities += 1
-                subject = subject()
-                with django.core.mail.get_connection() as connection:
-                    for subscriber in subscr_cities[k]:
-                        data = {'today': today}
-                        html = django.template.loader.render_to_string(
-                            'weather_discount_email.html',
-                            data,
-                        )
-                        email = django.core.mail.EmailMessage(
-                            subject=subject,
-                            body=html,
-                            from_email=django.conf.settings.DEFAULT_FROM_EMAIL,
-                            to=[subscriber.email],
-                            connection=connection,
+        @return   - dict of (city name, state): list of subscribers
+        '''
+        # Subscribers already sent to within the window are left out, so
+        # running the command again does not send them twice
+        not_sent_since = None
+        if window > 0:
+            not_sent_since = django.utils.timezone.now() - (
+                datetime.timedelta(hours=window))
+        subscribers = subscriptions.models.Subscription.mailing_list(
+            newsletter, not_sent_since=not_sent_since)
+        subscr_cities = {}
+        for subscr in subscribers:
+            key = (subscr.city.name, subscr.city.state)
+            if key not in subscr_cities:
+                subscr_cities[key] = []
+            subscr_cities[key].append(subscr)
+        return subscr_cities
+
+    async def _fetch(self, keys, api_limit, quota, lease, concurrency,
+            verbosity):
+        '''
+        Weather of the cities from the API. Cities which cannot be fetched
+        are left out.
+
+        @return   - (keys, conditions, almanacs) of the cities left
+        '''
+
+        def failed(index, error):
+            self.failed += 1
+            if verbosity:
+                print('Could not fetch the weather of %s, %s: %s' % (
+                    keys[index] + (error,)))
+
+        conditions, almanacs, calls = await subscriptions.weather.fetch(
+            keys,
+            api_limit=api_limit,
+            quota=quota,
+            lease=lease,
+            concurrency=concurrency,
+            failed=failed,
+        )
+        self.api_calls += calls
+        fetched = [
+            i for i, city_conditions in enumerate(conditions)
+            if city_conditions is not None
+        ]
+        self.cities += len(fetched)
+        return (
+            [keys[i] for i in fetched],
+            [conditions[i] for i in fetched],
+            [almanacs[i] for i in fetched],
+        )
+
+    def _from_snapshot(self, keys, max_age):
+        '''
+        Weather of the cities from their snapshots. Cities without a snapshot
+        fetched in the last max_age hours are left out.
+
+        @return   - (keys, conditions, almanacs) of the cities left
+        '''
+        since = django.utils.timezone.now() - (
+            datetime.timedelta(hours=max_age))
+        snapshots = {
+            (snapshot.city.name, snapshot.city.state): snapshot
+            for snapshot in
+            subscriptions.models.WeatherSnapshot.fetched_since(since)
+        }
+        found, conditions, almanacs = [], [], []
+        for k in keys:
+            if k not in snapshots:
+                self.missing += 1
+                continue
+            city_conditions, almanac = snapshots[k].responses()
+            found.append(k)
+            conditions.append(city_conditions)
+            almanacs.append(almanac)
+            self.cities += 1
+        return found, conditions, almanacs
+
+    def _send(self, newsletter, subscr_cities, keys, conditions, almanacs,
+            verbosity):
+        classification = subscriptions.classify.classify(
+            conditions,
+            almanacs,
+            threshold=django.conf.settings.WEATHER_THRESHOLD_F,
+            bad_weather=django.conf.settings.WEATHER_BAD,
+            nice_weather=django.conf.settings.WEATHER_NICE,
+        )
+        subjects = subscriptions.classify.subjects(classification.variant)
+        template = subscriptions.emailtemplates.get_template(
+            'weather_discount_email.html')
+        # Cities whose weather could not be read are not classified
+        self.unclassified += len(keys) - len(classification.index)
+        for i, subject in zip(classification.index, subjects):
+            k = keys[i]
+            today = conditions[i]['current_observation']
+            # Same email for every subscriber of the city, encoded once
+            message = subscriptions.mail.BulkMessage(
+                subject=subject,
+                html=template.render({'today': today}),
+            )
+            with django.core.mail.get_connection() as connection:
+                for subscriber in subscr_cities[k]:
+                    message.send(connection, subscriber.email)
+                    subscriptions.models.Event(
+                        subscriber=subscriber,
+                        sender=django.conf.settings.DEFAULT_FROM_EMAIL,
+                        newsletter=newsletter,
+                        subject=subject,
+                    ).save()
+                    if verbosity:
+                        print('Email sent to <%s>, with subject: %s' % (
+                            subscriber.email, subject)
                         )
-                        email.content_subtype = 'html'
-                        email.send()
-                        subscriptions.models.Event(
-                            subscriber=subscriber,
-                            sender=django.conf.settings.DEFAULT_FROM_EMAIL,
-                            newsletter=newsletter,
-                            subject=subject,
-                        ).save()
-                        if verbosity:
-                            print('Email sent to <%s>, with subject: %s' % (
-                                subscriber.email, subject)
-                            )
-
-                        self.sent += 1
+
+                    self.sent += 1
 
     def handle(self, *args, **options):
-        loop = asyncio.get_event_loop()
         try:
-            loop.run_until_complete(self._send_bulk(
+            subscr_cities = self._mailing_list(
+                options['newsletter'], options['window'])
+            keys = list(subscr_cities)
+            if options['from_snapshot']:
+                keys, conditions, almanacs = self._from_snapshot(
+                    keys, options['max_age'])
+            else:
+                loop = asyncio.get_event_loop()
+                keys, conditions, almanacs = loop.run_until_complete(
+                    self._fetch(
+                        keys,
+                        api_limit=options['api_limit'],
+                        quota=subscriptions.weather.quota(
+                            kind=options['quota'],
+                            api_limit=options['api_limit'],
+                            quota_file=options['quota_file']),
+                        lease=options['lease'],
+                        concurrency=options['concurrency'],
+                        verbosity=options['verbosity']),
+                )
+            self._send(
                 newsletter=options['newsletter'],
-                api_limit=options['api_limit'],
-                verbosity=options['verbosity']),
+                subscr_cities=subscr_cities,
+                keys=keys,
+                conditions=conditions,
+                almanacs=almanacs,
+                verbosity=options['verbosity'],
             )
         except KeyboardInterrupt:
             pass
         finally:
             print(
-                '\nShutting down asyncio event loop.',
                 '\nSent %i emails' % (self.sent,),
                 '\nGot weather for %i cities' % (self.cities,),
-                '\nMade %i calls to wunderground API' % (self.cities * 2,)
+                '\nNo recent snapshot for %i cities' % (self.missing,),
+                '\nCould not fetch the weather of %i cities' % (self.failed,),
+                '\nCould not read the weather of %i cities' % (
+                    self.unclassified,),
+                '\nMade %i calls to wunderground API' % (self.api_calls,)
             )
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.7 on 2026-10-19 16:41
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='City',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('state', models.CharField(choices=[('AL', 'ALABAMA'), ('AK', 'ALASKA'), ('AZ', 'ARIZONA'), ('AR', 'ARKANSAS'), ('CA', 'CALIFORNIA'), ('CO', 'COLORADO'), ('CT', 'CONNECTICUT'), ('DE', 'DELAWARE'), ('FL', 'FLORIDA'), ('GA', 'GEORGIA'), ('HI', 'HAWAII'), ('ID', 'IDAHO'), ('IL', 'ILLINOIS'), ('IN', 'INDIANA'), ('IA', 'IOWA'), ('KS', 'KANSAS'), ('KY', 'KENTUCKY'), ('LA', 'LOUISIANA'), ('ME', 'MAINE'), ('MD', 'MARYLAND'), ('MA', 'MASSACHUSETTS'), ('MI', 'MICHIGAN'), ('MN', 'MINNESOTA'), ('MS', 'MISSISSIPPI'), ('MO', 'MISSOURI'), ('MT', 'MONTANA'), ('NE', 'NEBRASKA'), ('NV', 'NEVADA'), ('NH', 'NEW HAMPSHIRE'), ('NJ', 'NEW JERSEY'), ('NM', 'NEW MEXICO'), ('NY', 'NEW YORK'), ('NC', 'NORTH CAROLINA'), ('ND', 'NORTH DAKOTA'), ('OH', 'OHIO'), ('OK', 'OKLAHOMA'), ('OR', 'OREGON'), ('PA', 'PENNSYLVANIA'), ('RI', 'RHODE ISLAND'), ('SC', 'SOUTH CAROLINA'), ('SD', 'SOUTH DAKOTA'), ('TN', 'TENNESSEE'), ('TX', 'TEXAS'), ('UT', 'UTAH'), ('VT', 'VERMONT'), ('VA', 'VIRGINIA'), ('WA', 'WASHINGTON'), ('WV', 'WEST VIRGINIA'), ('WI', 'WISCONSIN'), ('WY', 'WYOMING'), ('DC', 'DISTRICT OF COLUMBIA'), ('GU', 'GUAM'), ('PR', 'PUERTO RICO'), ('VI', 'VIRGIN ISLANDS')], max_length=2)),
+                ('population', models.IntegerField()),
+                ('time_zone', models.CharField(max_length=200)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Event',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sender', models.EmailField(db_index=True, max_length=254)),
+                ('date_sent', models.DateTimeField(auto_now_add=True, verbose_name='date email was sent')),
+                ('newsletter', models.CharField(choices=[('WD', 'WEATHER DISCOUNT')], max_length=2)),
+                ('subject', models.CharField(max_length=998)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Subscription',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(db_index=True, max_length=254)),
+                ('subscribed', models.BooleanField(db_index=True, default=True, verbose_name='subscribed')),
+                ('date_subscribed', models.DateTimeField(auto_now_add=True, verbose_name='subscribe date')),
+                ('date_unsubscribed', models.DateTimeField(blank=True, null=True, verbose_name='unsubscribe date')),
+                ('newsletter', models.CharField(choices=[('WD', 'WEATHER DISCOUNT')], max_length=2)),
+                ('city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='subscriptions.City')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='subscriber',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='subscriptions.Subscription'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='city',
+            unique_together=set([('name', 'state')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='subscription',
+            unique_together=set([('email', 'newsletter')]),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.7 on 2026-10-19 16:41
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiQuota',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+                ('limit', models.IntegerField(verbose_name='api calls per minute')),
+                ('window_start', models.DateTimeField(verbose_name='window start')),
+                ('used', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='subscriber',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='subscriptions.Subscription'),
+        ),
+        migrations.AlterField(
+            model_name='subscription',
+            name='subscribed',
+            field=models.BooleanField(default=True, verbose_name='subscribed'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['subscriber', 'date_sent'], name='event_subscriber_sent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['newsletter', 'date_sent'], name='event_newsletter_sent_idx'),
+        ),
+        # Partial index for Subscription.mailing_list, which Django 1.11
+        # cannot declare on the model. id and email are part of the key so
+        # the mailing list is scanned index only.
+        migrations.RunSQL(
+            sql=[
+                'CREATE INDEX subscription_mailing_list_idx '
+                'ON subscriptions_subscription '
+                '(newsletter, city_id, id, email) WHERE subscribed',
+            ],
+            reverse_sql=['DROP INDEX subscription_mailing_list_idx'],
+        ),
+    ]
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.7 on 2026-10-19 16:43
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from subscriptions import partitions
+
+
+def partition_events(apps, schema_editor):
+    connection = schema_editor.connection
+    if (partitions.supported(connection)
+            and not partitions.is_partitioned(connection)):
+        partitions.partition_table(
+            schema_editor, apps.get_model('subscriptions', 'Event'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0002_mailer_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventDaily',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True)),
+                ('newsletter', models.CharField(choices=[('WD', 'WEATHER DISCOUNT')], max_length=2)),
+                ('subject', models.CharField(max_length=998)),
+                ('count', models.IntegerField(default=0)),
+                ('city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='subscriptions.City')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='eventdaily',
+            unique_together=set([('day', 'newsletter', 'city', 'subject')]),
+        ),
+        # Left partitioned when reverting: the table keeps working as before
+        migrations.RunPython(partition_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.7 on 2026-10-19 16:57
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0003_event_partitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_fetched', models.DateTimeField(verbose_name='date fetched')),
+                ('conditions', models.TextField()),
+                ('almanac', models.TextField()),
+                ('city', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='subscriptions.City')),
+            ],
+        ),
+    ]
@@ -1,7 +1,10 @@
 import datetime
+import json
 
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models, IntegrityError
+from django.db import connection, models, transaction, IntegrityError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from subscriptions import util
 
@@ -21,9 +24,9 @@ class City(models.Model):
 
 class Subscription(models.Model):
     email = models.EmailField(db_index=True)
-    subscribed = models.BooleanField(
-        default=True, verbose_name='subscribed', db_index=True
-    )
+    # Not indexed on its own: the mailing list is served by the partial
+    # index subscription_mailing_list_idx (see migration 0002)
+    subscribed = models.BooleanField(default=True, verbose_name='subscribed')
     date_subscribed = models.DateTimeField(
         verbose_name='subscribe date', auto_now_add=True
     )
@@ -36,6 +39,46 @@ class Subscription(models.Model):
     class Meta:
         unique_together = ('email', 'newsletter')
 
+    @classmethod
+    def mailing_list(cls, newsletter, not_sent_since=None):
+        '''
+        Subscribers of a newsletter, with their city, ordered by city.
+        Only the columns covered by the partial index on
+        (newsletter, city_id, id, email) WHERE subscribed are read from the
+        subscription table, so it can be scanned index only.
+
+        @param not_sent_since   - if given, leave out the subscribers who
+                                  were sent the newsletter since then, in
+                                  the same query (anti-join on Event)
+        '''
+        subscribers = cls.objects.filter(
+            subscribed=True, newsletter=newsletter,
+        ).select_related('city').only(
+            'id', 'email', 'city__name', 'city__state',
+        ).order_by('city_id')
+        if not_sent_since is not None:
+            # NOT EXISTS, which PostgreSQL plans as a hash anti-join
+            # whatever the number of events, where NOT IN falls back to a
+            # rescan per subscriber once the events do not fit in work_mem.
+            # Written out: an Exists annotation filtered on False compiles
+            # to EXISTS (...) = false on Django 1.11, which is not
+            # turned into an anti-join
+            subscribers = subscribers.extra(
+                where=['NOT EXISTS (SELECT 1 FROM %(event)s '
+                    'WHERE %(event)s.subscriber_id = %(subscription)s.id '
+                    'AND %(event)s.newsletter = %%s '
+                    'AND %(event)s.date_sent >= %%s)' % {
+                        'event': Event._meta.db_table,
+                        'subscription': cls._meta.db_table,
+                    }],
+                params=[
+                    newsletter,
+                    connection.ops.adapt_datetimefield_value(
+                        not_sent_since),
+                ],
+            )
+        return subscribers
+
     @classmethod
     def subscribe(cls, email, newsletter, city):
         '''
@@ -82,9 +125,138 @@ class Subscription(models.Model):
 
 
 class Event(models.Model):
-    subscriber = models.ForeignKey(Subscription, on_delete=models.CASCADE)
+    # Indexed together with date_sent, see Meta.indexes
+    subscriber = models.ForeignKey(
+        Subscription, on_delete=models.CASCADE, db_index=False)
     sender = models.EmailField(db_index=True)
     date_sent = models.DateTimeField(
         auto_now_add=True, verbose_name='date email was sent')
     newsletter = models.CharField(max_length=2, choices=util.NEWSLETTERS)
     subject = models.CharField(max_length=998)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['subscriber', 'date_sent'],
+                name='event_subscriber_sent_idx'),
+            models.Index(
+                fields=['newsletter', 'date_sent'],
+                name='event_newsletter_sent_idx'),
+        ]
+
+
+class EventDaily(models.Model):
+    '''
+    Daily count of the events compacted out of the Event table
+    (see the compact_events command).
+    City is the one of the subscriber at the time of compaction.
+    '''
+    day = models.DateField(db_index=True)
+    newsletter = models.CharField(max_length=2, choices=util.NEWSLETTERS)
+    city = models.ForeignKey(City, on_delete=models.CASCADE)
+    subject = models.CharField(max_length=998)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('day', 'newsletter', 'city', 'subject')
+
+
+class ApiQuota(models.Model):
+    name = models.CharField(max_length=200, unique=True)
+    limit = models.IntegerField(verbose_name='api calls per minute')
+    window_start = models.DateTimeField(verbose_name='window start')
+    used = models.IntegerField(default=0)
+
+    @classmethod
+    def shared(cls, name, limit):
+        '''
+        Get the quota shared by every process using the same name, creating
+        it if it does not exist yet. The limit is updated to the one given.
+        '''
+        obj, created = cls.objects.get_or_create(
+            name=name,
+            defaults={'limit': limit, 'window_start': cls._db_now()},
+        )
+        if not created and obj.limit != limit:
+            obj.limit = limit
+            obj.save(update_fields=['limit'])
+        return obj
+
+    @staticmethod
+    def _db_now():
+        '''
+        Time of the database, the one clock shared by every host.
+        '''
+        # now() on PostgreSQL is the start of the transaction, which may
+        # have waited for the lock
+        sql = 'SELECT CURRENT_TIMESTAMP'
+        if connection.vendor == 'postgresql':
+            sql = 'SELECT statement_timestamp()'
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            now, = cursor.fetchone()
+        # SQLite returns text, in UTC
+        if isinstance(now, str):
+            now = parse_datetime(now)
+        if timezone.is_naive(now):
+            now = timezone.make_aware(now, timezone.utc)
+        return now
+
+    def lease(self, count):
+        '''
+        Lease up to count tokens from the current window of a minute.
+        The row is locked for the duration of the update, so concurrent
+        processes never lease more than the limit in total. Windows are
+        timed by the clock of the database, not the one of each host.
+
+        @return   - (number of tokens granted, 0 if the window is spent,
+                    seconds left in the window)
+        '''
+        with transaction.atomic():
+            quota = ApiQuota.objects.select_for_update().get(pk=self.pk)
+            now = self._db_now()
+            if (now - quota.window_start).total_seconds() > 1 * 60:
+                quota.window_start = now
+                quota.used = 0
+            granted = max(0, min(count, quota.limit - quota.used))
+            quota.used += granted
+            quota.save(update_fields=['window_start', 'used'])
+        return granted, 1 * 60 - (now - quota.window_start).total_seconds()
+
+
+class WeatherSnapshot(models.Model):
+    '''
+    Weather of a city fetched ahead of sending (see the prefetch_weather
+    command), so send_emails --from-snapshot makes no API calls.
+    Only the latest snapshot of each city is kept.
+    '''
+    city = models.OneToOneField(City, on_delete=models.CASCADE)
+    date_fetched = models.DateTimeField(verbose_name='date fetched')
+    # wunderground responses, as JSON
+    conditions = models.TextField()
+    almanac = models.TextField()
+
+    @classmethod
+    def store(cls, city_id, conditions, almanac):
+        '''
+        Replace the snapshot of a city with the responses just fetched.
+        '''
+        cls.objects.update_or_create(city_id=city_id, defaults={
+            'date_fetched': timezone.now(),
+            'conditions': json.dumps(conditions),
+            'almanac': json.dumps(almanac),
+        })
+
+    @classmethod
+    def fetched_since(cls, since):
+        '''
+        Snapshots fetched since the given time, with their city.
+        '''
+        return cls.objects.filter(
+            date_fetched__gte=since).select_related('city')
+
+    def responses(self):
+        '''
+        @return   - (conditions, almanac) responses
+        '''
+        return json.loads(self.conditions), json.loads(self.almanac)
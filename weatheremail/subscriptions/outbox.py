@@ -0,0 +1,73 @@
+'''
+Hand emails off to a pool of background threads, so the request which
+triggered them does not wait for the template rendering and SMTP.
+
+The pool size is EMAIL_WORKERS in the settings; with 0 workers emails are
+sent in the calling thread, as before. At most EMAIL_QUEUE emails wait for
+a worker: past that they are sent in the calling thread too, which slows
+the requests down rather than piling emails up in memory.
+Delivery is not durable: emails still waiting when the process exits are
+lost.
+'''
+import concurrent.futures
+import logging
+import threading
+
+import django
+
+logger = logging.getLogger(__name__)
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _slots
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                settings = django.conf.settings
+                _slots = threading.BoundedSemaphore(
+                    settings.EMAIL_WORKERS + settings.EMAIL_QUEUE)
+                _executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=settings.EMAIL_WORKERS)
+    return _executor
+
+
+def _log_error(future):
+    error = future.exception()
+    if error is not None:
+        logger.error('Failed to send email: %s', error, exc_info=error)
+
+
+def _release(future):
+    _slots.release()
+
+
+def _run(func, *args, **kwds):
+    future = concurrent.futures.Future()
+    try:
+        future.set_result(func(*args, **kwds))
+    except Exception as e:
+        future.set_exception(e)
+    _log_error(future)
+    return future
+
+
+def submit(func, *args, **kwds):
+    '''
+    Run func(*args, **kwds), which builds and sends an email, in the
+    background. Errors are logged, since nobody waits for the result.
+
+    @return   - concurrent.futures.Future of the result
+    '''
+    if not django.conf.settings.EMAIL_WORKERS:
+        return _run(func, *args, **kwds)
+    executor = _get_executor()
+    # Every worker busy and the queue full: send it now
+    if not _slots.acquire(blocking=False):
+        return _run(func, *args, **kwds)
+    future = executor.submit(func, *args, **kwds)
+    future.add_done_callback(_release)
+    future.add_done_callback(_log_error)
+    return future
@@ -0,0 +1,157 @@
+'''
+Monthly partitions of the subscriptions_event table on PostgreSQL (11+).
+
+subscriptions_event is partitioned by range of date_sent, with one
+partition per month named subscriptions_event_yYYYYmMM and a default
+partition catching events of months whose partition was not created yet,
+until it is (see create_partition).
+On other databases, or older PostgreSQL, the table is left as is and
+every function here is a no-op (see supported).
+'''
+import datetime
+import re
+
+from django.db import transaction
+
+TABLE = 'subscriptions_event'
+DEFAULT = '%s_default' % (TABLE,)
+PARTITION_RE = re.compile(r'^%s_y(\d{4})m(\d{2})$' % (TABLE,))
+
+
+def supported(connection):
+    '''
+    Whether the database supports partitioning subscriptions_event.
+    '''
+    return (connection.vendor == 'postgresql'
+        and connection.pg_version >= 110000)
+
+
+def is_partitioned(connection):
+    '''
+    Whether subscriptions_event is a partitioned table.
+    '''
+    if not supported(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table '
+            'WHERE partrelid = %s::regclass', [TABLE])
+        return cursor.fetchone() is not None
+
+
+def month_start(date):
+    return datetime.date(date.year, date.month, 1)
+
+
+def next_month(date):
+    if date.month == 12:
+        return datetime.date(date.year + 1, 1, 1)
+    return datetime.date(date.year, date.month + 1, 1)
+
+
+def partition_name(month):
+    return '%s_y%04im%02i' % (TABLE, month.year, month.month)
+
+
+def create_partition(cursor, month):
+    '''
+    Create the partition of the month of the given date, if it does not
+    exist yet. Events of the month already in the default partition (when
+    the partition was not created ahead of time) are moved to it.
+    '''
+    month = month_start(month)
+    name = partition_name(month)
+    cursor.execute('SELECT to_regclass(%s)', [name])
+    if cursor.fetchone()[0] is not None:
+        return
+    # Bounds must be literals, not parameters, on PostgreSQL 11
+    bounds = 'FROM (\'%s\') TO (\'%s\')' % (
+        month.isoformat(), next_month(month).isoformat())
+    where = 'date_sent >= %s AND date_sent < %s'
+    params = [month, next_month(month)]
+    cursor.execute(
+        'SELECT 1 FROM %s WHERE %s LIMIT 1' % (DEFAULT, where), params)
+    if cursor.fetchone() is None:
+        cursor.execute('CREATE TABLE %s PARTITION OF %s FOR VALUES %s' % (
+            name, TABLE, bounds))
+        return
+    # A partition cannot be created while the default partition holds
+    # events of its range: take the default partition out meanwhile
+    with transaction.atomic(using=cursor.db.alias):
+        cursor.execute('ALTER TABLE %s DETACH PARTITION %s' % (
+            TABLE, DEFAULT))
+        cursor.execute('CREATE TABLE %s PARTITION OF %s FOR VALUES %s' % (
+            name, TABLE, bounds))
+        cursor.execute('INSERT INTO %s SELECT * FROM %s WHERE %s' % (
+            name, DEFAULT, where), params)
+        cursor.execute('DELETE FROM %s WHERE %s' % (DEFAULT, where), params)
+        cursor.execute('ALTER TABLE %s ATTACH PARTITION %s DEFAULT' % (
+            TABLE, DEFAULT))
+
+
+def partitions(cursor):
+    '''
+    Months of the existing partitions, sorted, not including the default
+    partition.
+    '''
+    cursor.execute(
+        'SELECT c.relname FROM pg_inherits i '
+        'JOIN pg_class c ON c.oid = i.inhrelid '
+        'WHERE i.inhparent = %s::regclass', [TABLE])
+    months = []
+    for name, in cursor.fetchall():
+        match = PARTITION_RE.match(name)
+        if match is not None:
+            months.append(datetime.date(
+                int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def drop_partition(cursor, month):
+    '''
+    Detach and drop the partition of the month of the given date, with all
+    its events.
+    '''
+    name = partition_name(month_start(month))
+    cursor.execute('ALTER TABLE %s DETACH PARTITION %s' % (TABLE, name))
+    cursor.execute('DROP TABLE %s' % (name,))
+
+
+def partition_table(schema_editor, model, ahead=2):
+    '''
+    Turn subscriptions_event into a table partitioned by month, keeping its
+    events, indexes and foreign key. Partitions are created from the month
+    of the oldest event up to ahead months from now.
+    The primary key becomes (id, date_sent), since PostgreSQL requires the
+    partition key to be part of it; id stays unique through its sequence.
+    '''
+    old = '%s_unpartitioned' % (TABLE,)
+    execute = schema_editor.execute
+    execute('ALTER TABLE %s RENAME TO %s' % (TABLE, old))
+    execute('ALTER TABLE %s RENAME CONSTRAINT %s_pkey TO %s_pkey' % (
+        old, TABLE, old))
+    execute(
+        'CREATE TABLE %s (LIKE %s INCLUDING DEFAULTS) '
+        'PARTITION BY RANGE (date_sent)' % (TABLE, old))
+    execute('ALTER TABLE %s ADD PRIMARY KEY (id, date_sent)' % (TABLE,))
+    execute('ALTER SEQUENCE %s_id_seq OWNED BY %s.id' % (TABLE, TABLE))
+    execute('CREATE TABLE %s PARTITION OF %s DEFAULT' % (DEFAULT, TABLE))
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT min(date_sent) FROM %s' % (old,))
+        oldest, = cursor.fetchone()
+        month = month_start(oldest or datetime.date.today())
+        last = month_start(datetime.date.today())
+        for _ in range(ahead):
+            last = next_month(last)
+        while month <= last:
+            create_partition(cursor, month)
+            month = next_month(month)
+    execute('INSERT INTO %s SELECT * FROM %s' % (TABLE, old))
+    execute('DROP TABLE %s' % (old,))
+    for sql in schema_editor._model_indexes_sql(model):
+        execute(sql)
+    execute(schema_editor._create_fk_sql(
+        model,
+        model._meta.get_field('subscriber'),
+        '_fk_%(to_table)s_%(to_column)s',
+    ))
@@ -1,3 +1,686 @@
-from django.test import TestCase  # noqa F401
+import asyncio
+import contextlib
+import datetime
+import email
+import email.policy
+import io
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail as django_mail
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import (
+    SimpleTestCase, TestCase, TransactionTestCase, override_settings)
+from django.utils import timezone
+
+from apis import wunderground
+from subscriptions import (
+    classify, emailtemplates, forms, mail, models, outbox, partitions,
+    weather)
+from subscriptions.management.commands import prefetch_weather
+
+
+def conditions(weather, feelslike_f):
+    return {'current_observation': {
+        'weather': weather, 'feelslike_f': str(feelslike_f)}}
+
+
+def almanac(high, low):
+    return {'almanac': {
+        'temp_high': {'normal': {'F': str(high)}},
+        'temp_low': {'normal': {'F': str(low)}},
+    }}
+
+
+class FileQuotaTestCase(SimpleTestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+
+    def test_lease(self):
+        quota = wunderground.FileQuota(self.path, limit=7)
+        with mock.patch('time.time', return_value=1000.0):
+            self.assertEqual(quota.lease(5), (5, 60.0))
+        with mock.patch('time.time', return_value=1010.0):
+            # Another process, sharing the same file
+            other = wunderground.FileQuota(self.path, limit=7)
+            self.assertEqual(other.lease(5), (2, 50.0))
+            self.assertEqual(quota.lease(5), (0, 50.0))
+        # The window ended, the whole limit can be leased again
+        with mock.patch('time.time', return_value=1061.0):
+            self.assertEqual(quota.lease(5), (5, 60.0))
+
+
+class ApiQuotaTestCase(TestCase):
+    def test_lease(self):
+        quota = models.ApiQuota.shared('test', limit=3)
+        granted, remaining = quota.lease(2)
+        self.assertEqual(granted, 2)
+        self.assertTrue(0 < remaining <= 60, remaining)
+        self.assertEqual(quota.lease(2)[0], 1)
+        other = models.ApiQuota.shared('test', limit=3)
+        self.assertEqual(other.lease(2)[0], 0)
+        models.ApiQuota.objects.filter(name='test').update(
+            window_start=timezone.now() - datetime.timedelta(minutes=2))
+        self.assertEqual(quota.lease(2)[0], 2)
+
+
+class LeasedTokenBucketTestCase(SimpleTestCase):
+    class Quota(object):
+        leased = 0
+
+        def lease(self, count):
+            self.leased += count
+            return count, 60.0
+
+    def test_expired_tokens(self):
+        quota = self.Quota()
+        bucket = wunderground.LeasedTokenBucket(None, quota=quota, lease=3)
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        loop.run_until_complete(bucket._wait_for_token())
+        self.assertEqual((quota.leased, bucket._tokens), (3, 2))
+        loop.run_until_complete(bucket._wait_for_token())
+        self.assertEqual((quota.leased, bucket._tokens), (3, 1))
+        # The window of the lease ended: its last token is not spent
+        bucket._expires_at = time.monotonic() - 1
+        loop.run_until_complete(bucket._wait_for_token())
+        self.assertEqual((quota.leased, bucket._tokens), (6, 2))
+
+    def test_spent_window(self):
+        calls = []
+
+        class Quota(object):
+            def lease(self, count):
+                calls.append(count)
+                # The first window is spent, for 0.3 more seconds
+                if len(calls) == 1:
+                    return 0, 0.3
+                return count, 60.0
+
+        bucket = wunderground.LeasedTokenBucket(None, quota=Quota(), lease=5)
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        async def wait(count):
+            await asyncio.gather(
+                *(bucket._wait_for_token() for _ in range(count)))
+
+        start = time.monotonic()
+        loop.run_until_complete(wait(10))
+        self.assertGreaterEqual(time.monotonic() - start, 0.3)
+        # Waited for the window to end instead of asking again meanwhile,
+        # then one lease for every 5 waiters
+        self.assertEqual(len(calls), 3)
+
+
+class ClassifyTestCase(SimpleTestCase):
+    cities = [
+        (conditions('Rain', 60), almanac(70, 50), classify.BAD),
+        (conditions('Partly Cloudy', 54), almanac(70, 50), classify.BAD),
+        (conditions('Clear', 58), almanac(70, 50), classify.NICE),
+        (conditions('Partly Cloudy', 66), almanac(70, 50), classify.NICE),
+        (conditions('Partly Cloudy', 62), almanac(70, 50), classify.NEUTRAL),
+        # Bad weather wins over feeling warmer
+        (conditions('Overcast', 80), almanac(70, 50), classify.BAD),
+    ]
+
+    def _classify(self, **kwds):
+        return classify.classify(
+            [c[0] for c in self.cities], [c[1] for c in self.cities], **kwds)
+
+    def test_python(self):
+        result = self._classify(use_numpy=False)
+        self.assertEqual(list(result.average), [60.0] * len(self.cities))
+        self.assertEqual(list(result.delta), [0, -6, -2, 6, 2, 20])
+        self.assertEqual(
+            list(result.variant), [c[2] for c in self.cities])
+
+    def test_numpy(self):
+        if not classify.HAS_NUMPY:
+            self.skipTest('numpy is not installed')
+        expected = self._classify(use_numpy=False)
+        result = self._classify(use_numpy=True)
+        self.assertEqual(list(result.delta), list(expected.delta))
+        self.assertEqual(list(result.variant), list(expected.variant))
+
+    def test_thresholds(self):
+        result = self._classify(
+            use_numpy=False, threshold=1.0, bad_weather=(),
+            nice_weather=('rain',))
+        self.assertEqual(list(result.variant), [
+            classify.NICE, classify.BAD, classify.BAD, classify.NICE,
+            classify.NICE, classify.NICE])
+
+    def test_unreadable(self):
+        result = classify.classify(
+            [conditions('Clear', 70), conditions('Clear', 'NA'),
+                {'response': {}}, conditions('Rain', 60)],
+            [almanac(70, 50)] * 4,
+            use_numpy=False)
+        self.assertEqual(list(result.index), [0, 3])
+        self.assertEqual(
+            list(result.variant), [classify.NICE, classify.BAD])
+
+    def test_subjects(self):
+        self.assertEqual(
+            classify.subjects([classify.NICE]),
+            ['It\'s nice out! Enjoy a discount on us.'])
+
+
+class EmailTemplatesTestCase(SimpleTestCase):
+    def test_is_stale(self):
+        with tempfile.TemporaryDirectory() as templates_dir:
+            with open(os.path.join(templates_dir, 'a.html'), 'w') as fp:
+                fp.write('<p>a</p>')
+            self.assertTrue(emailtemplates.is_stale('a.html', templates_dir))
+            emailtemplates.build_all(['a.html'], templates_dir)
+            self.assertFalse(emailtemplates.is_stale('a.html', templates_dir))
+            # The source was edited after the build
+            os.utime(
+                os.path.join(templates_dir, 'a.html'),
+                (time.time() + 10, time.time() + 10))
+            self.assertTrue(emailtemplates.is_stale('a.html', templates_dir))
+
+    def test_build_all(self):
+        with tempfile.TemporaryDirectory() as build_dir:
+            emailtemplates.build_all(build_dir=build_dir)
+            # Written aside and renamed, nothing else is left
+            self.assertEqual(
+                sorted(os.listdir(build_dir)),
+                sorted(emailtemplates.TEMPLATES))
+            for name in emailtemplates.TEMPLATES:
+                path = os.path.join(build_dir, name)
+                self.assertEqual(os.stat(path).st_mode & 0o777, 0o644)
+                with open(path) as fp:
+                    built = fp.read()
+                with open(os.path.join(
+                        emailtemplates.TEMPLATES_DIR, name)) as fp:
+                    source = fp.read()
+                self.assertNotIn('<script', built)
+                self.assertNotIn('stylesheet', built)
+                self.assertLess(len(built), len(source))
+                # Same text and template tags, only the markup around changed
+                self.assertEqual(
+                    self._text(built), self._text(source), name)
+
+    def _text(self, html):
+        html = re.sub(r'<script.*?</script>|<!--.*?-->', '', html, flags=re.S)
+        return re.sub(r'<[^>]*>|\s+', ' ', html).split()
+
+    def test_minify(self):
+        html = emailtemplates.minify(
+            '<html>\n  <link rel="stylesheet" href="x.css">\n'
+            '  <!-- comment -->\n  <b>{{ a }}</b> <i>b</i>\n'
+            '  <script src="x.js"></script>\n</html>')
+        self.assertEqual(html, '<html><b>{{ a }}</b> <i>b</i></html>\n')
+
+
+class BulkMessageTestCase(SimpleTestCase):
+    html = '<p>%s caf\xe9</p>\n' % ('x' * 100,)
+
+    def _message(self):
+        return mail.BulkMessage(
+            subject='Enjoy a discount on us \u2014 \xe9', html=self.html,
+            from_email='Weather <weather@example.com>')
+
+    def test_message(self):
+        message = self._message()
+        first = message.message('a@example.com')
+        second = message.message('b@example.com')
+        self.assertNotIn(b'\n', first.replace(b'\r\n', b''))
+        parsed = email.message_from_bytes(first, policy=email.policy.default)
+        self.assertEqual(parsed['To'], 'a@example.com')
+        self.assertEqual(parsed['From'], 'Weather <weather@example.com>')
+        self.assertEqual(parsed['Subject'], message.subject)
+        # No unsubscribe link until the app has a page to unsubscribe
+        self.assertNotIn('List-Unsubscribe', parsed)
+        self.assertEqual(parsed.get_content_type(), 'text/html')
+        self.assertEqual(
+            parsed.get_content(), self.html.replace('\n', '\r\n'))
+        self.assertNotEqual(
+            parsed['Message-ID'],
+            email.message_from_bytes(second)['Message-ID'])
+
+    def test_long_subject(self):
+        subject = 'Il fait beau \xe0 Fresno ! ' * 4
+        message = mail.BulkMessage(
+            subject=subject, html=self.html,
+            from_email='weather@example.com')
+        data = message.message('a@example.com')
+        # Folded, with CRLF only
+        self.assertIn(b'?=\r\n =?utf-8?', data)
+        self.assertNotIn(b'\n', data.replace(b'\r\n', b''))
+        parsed = email.message_from_bytes(data, policy=email.policy.default)
+        self.assertEqual(parsed['Subject'], subject)
+
+    def test_send_other_backend(self):
+        connection = django_mail.get_connection(
+            'django.core.mail.backends.locmem.EmailBackend')
+        django_mail.outbox = []
+        self._message().send(connection, 'a@example.com')
+        sent, = django_mail.outbox
+        self.assertEqual(sent.to, ['a@example.com'])
+        self.assertEqual(sent.body, self.html)
+        self.assertIn('Message-ID', sent.extra_headers)
+
+
+class SnapshotTestCase(TestCase):
+    def setUp(self):
+        self.cities = [
+            models.City.objects.create(
+                name=name, state='CA', population=1, time_zone='UTC')
+            for name in ('Fresno', 'Oakland')
+        ]
+        for city in self.cities:
+            models.Subscription.objects.create(
+                email='%s@example.com' % (city.name,), newsletter='WD',
+                city=city)
+        models.WeatherSnapshot.store(
+            self.cities[0].id, conditions('Clear', 70), almanac(70, 50))
+        models.WeatherSnapshot.store(
+            self.cities[1].id, conditions('Rain', 50), almanac(70, 50))
+
+    def _send(self, **options):
+        output = io.StringIO()
+        django_mail.outbox = []
+        with contextlib.redirect_stdout(output):
+            call_command(
+                'send_emails', from_snapshot=True, max_age=1, verbosity=0,
+                **options)
+        return output.getvalue()
+
+    def test_send_from_snapshot(self):
+        output = self._send()
+        self.assertIn('Made 0 calls to wunderground API', output)
+        self.assertEqual(
+            sorted((m.to[0], m.subject) for m in django_mail.outbox), [
+                ('Fresno@example.com', classify.SUBJECTS[classify.NICE]),
+                ('Oakland@example.com', classify.SUBJECTS[classify.BAD]),
+            ])
+        self.assertEqual(models.Event.objects.count(), 2)
+
+    def test_window(self):
+        fresno = models.Subscription.objects.get(city=self.cities[0])
+        models.Event.objects.create(
+            subscriber=fresno, sender='weather@example.com',
+            newsletter='WD', subject='sent earlier')
+        self._send()
+        self.assertEqual(
+            [m.to for m in django_mail.outbox], [['Oakland@example.com']])
+        # Both were sent to in the window now
+        self._send()
+        self.assertEqual(django_mail.outbox, [])
+        self._send(window=0)
+        self.assertEqual(len(django_mail.outbox), 2)
+
+    def test_daily_window(self):
+        # Sent by yesterday's run, 5 minutes after it started at this time
+        fresno = models.Subscription.objects.get(city=self.cities[0])
+        models.Event.objects.create(
+            subscriber=fresno, sender='weather@example.com',
+            newsletter='WD', subject='sent yesterday')
+        models.Event.objects.update(date_sent=timezone.now() - (
+            datetime.timedelta(hours=24) - datetime.timedelta(minutes=5)))
+        self._send()
+        self.assertEqual(len(django_mail.outbox), 2)
+
+    def test_old_snapshot(self):
+        models.WeatherSnapshot.objects.filter(city=self.cities[1]).update(
+            date_fetched=timezone.now() - datetime.timedelta(hours=2))
+        output = self._send()
+        self.assertIn('No recent snapshot for 1 cities', output)
+        self.assertEqual(
+            [m.to for m in django_mail.outbox], [['Fresno@example.com']])
+
+
+class FetchTestCase(SimpleTestCase):
+    class Client(object):
+        def __init__(self, **kwds):
+            self.calls = 0
+
+        async def get(self, feature, query):
+            self.calls += 1
+            if query['city'] == 'Nowhere':
+                raise wunderground.WunderGroundError(
+                    type_='querynotfound',
+                    description='No cities match your search query')
+            if feature == 'conditions':
+                return conditions('Clear', 70)
+            return almanac(70, 50)
+
+    def test_failed_city(self):
+        failures = []
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        with mock.patch.object(wunderground, 'Client', self.Client):
+            result = loop.run_until_complete(weather.fetch(
+                [('Fresno', 'CA'), ('Nowhere', 'CA'), ('Oakland', 'CA')],
+                api_limit=10,
+                failed=lambda index, error: failures.append(index),
+            ))
+        # The other cities are fetched all the same, no almanac is asked for
+        # the city whose conditions failed
+        self.assertEqual(result, (
+            [conditions('Clear', 70), None, conditions('Clear', 70)],
+            [almanac(70, 50), None, almanac(70, 50)],
+            5,
+        ))
+        self.assertEqual(failures, [1])
+
+    def test_calls(self):
+        class Response(object):
+            def __init__(self, status):
+                self.status = status
+                self.reason = 'Bad Gateway'
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc_info):
+                pass
+
+            async def read(self):
+                pass
+
+            async def json(self):
+                return {'response': {}}
+
+        class Session(object):
+            statuses = [200, 502]
+
+            def get(self, url, params):
+                return Response(self.statuses.pop(0))
+
+        client = wunderground.Client(Session(), key='key', limit=10)
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        query = {'city': 'Fresno', 'state': 'CA'}
+        loop.run_until_complete(client.get('conditions', query))
+        with self.assertRaises(wunderground.WunderGroundError):
+            loop.run_until_complete(client.get('almanac', query))
+        # Not a call: no location to ask for
+        with self.assertRaises(wunderground.ParameterError):
+            loop.run_until_complete(client.get('almanac', {}))
+        self.assertEqual(client.calls, 2)
+
+
+class PrefetchWeatherTestCase(TestCase):
+    def test_cities(self):
+        fresno, oakland = [
+            models.City.objects.create(
+                name=name, state='CA', population=1, time_zone='UTC')
+            for name in ('Fresno', 'Oakland')
+        ]
+        for address, newsletter, city, subscribed in (
+                ('a@example.com', 'WD', fresno, True),
+                ('b@example.com', 'WD', fresno, True),
+                ('c@example.com', 'XX', oakland, True),
+                ('d@example.com', 'WD', oakland, False)):
+            models.Subscription.objects.create(
+                email=address, newsletter=newsletter, city=city,
+                subscribed=subscribed)
+        command = prefetch_weather.Command()
+        # Oakland has no subscriber to WD, only one who unsubscribed
+        self.assertEqual(
+            command._cities('WD'), [(fresno.id, 'Fresno', 'CA')])
+        self.assertEqual(command._cities(None), [
+            (fresno.id, 'Fresno', 'CA'), (oakland.id, 'Oakland', 'CA')])
+
+
+class CompactEventsTestCase(TestCase):
+    def setUp(self):
+        city = models.City.objects.create(
+            name='Fresno', state='CA', population=1, time_zone='UTC')
+        self.subscriber = models.Subscription.objects.create(
+            email='a@example.com', newsletter='WD', city=city)
+        self.old = timezone.now() - datetime.timedelta(days=100)
+
+    def _event(self, subject, date_sent):
+        event = models.Event.objects.create(
+            subscriber=self.subscriber, sender='weather@example.com',
+            newsletter='WD', subject=subject)
+        models.Event.objects.filter(pk=event.pk).update(date_sent=date_sent)
+
+    def _counts(self):
+        return sorted(models.EventDaily.objects.values_list(
+            'day', 'newsletter', 'city__name', 'subject', 'count'))
+
+    def test_compact(self):
+        for _ in range(3):
+            self._event('nice', self.old)
+        self._event('bad', self.old)
+        self._event('nice', timezone.now())
+        call_command('compact_events', retention_days=90, verbosity=0)
+        day = self.old.date()
+        self.assertEqual(self._counts(), [
+            (day, 'WD', 'Fresno', 'bad', 1),
+            (day, 'WD', 'Fresno', 'nice', 3),
+        ])
+        # Only the event within the retention window is left
+        self.assertEqual(models.Event.objects.count(), 1)
+
+        # Compacting again adds to the counts of the same day
+        for _ in range(2):
+            self._event('nice', self.old)
+        call_command('compact_events', retention_days=90, verbosity=0)
+        self.assertEqual(self._counts(), [
+            (day, 'WD', 'Fresno', 'bad', 1),
+            (day, 'WD', 'Fresno', 'nice', 5),
+        ])
+        self.assertEqual(models.Event.objects.count(), 1)
+
+
+class PartitionsTestCase(TransactionTestCase):
+    # Flushed after each test: only possible if the partitioned table is
+    # introspected, or its subscriber foreign key blocks truncating
+    def setUp(self):
+        if not partitions.is_partitioned(connection):
+            self.skipTest('subscriptions_event is not partitioned')
+        city = models.City.objects.create(
+            name='Fresno', state='CA', population=1, time_zone='UTC')
+        self.subscriber = models.Subscription.objects.create(
+            email='a@example.com', newsletter='WD', city=city)
+
+    def _partition(self, month):
+        '''
+        Create the partition of month, dropped after the test.
+        '''
+        name = partitions.partition_name(month)
+        self.addCleanup(
+            self._execute, 'DROP TABLE IF EXISTS %s' % (name,))
+        with connection.cursor() as cursor:
+            partitions.create_partition(cursor, month)
+        return name
+
+    def _execute(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            if cursor.description is not None:
+                return cursor.fetchall()
+
+    def _event(self, subject, date_sent):
+        event = models.Event.objects.create(
+            subscriber=self.subscriber, sender='weather@example.com',
+            newsletter='WD', subject=subject)
+        models.Event.objects.filter(pk=event.pk).update(date_sent=date_sent)
+
+    def _mid_month(self, month):
+        return datetime.datetime(
+            month.year, month.month, 15, 12, tzinfo=timezone.utc)
+
+    def test_compact(self):
+        now = timezone.now()
+        old = partitions.month_start(now - datetime.timedelta(days=200))
+        name = self._partition(old)
+        for _ in range(2):
+            self._event('nice', self._mid_month(old))
+        # Of a month without a partition, in the default partition
+        unpartitioned = now - datetime.timedelta(days=120)
+        self._event('bad', unpartitioned)
+        self._event('nice', now)
+        self.assertEqual(
+            self._execute('SELECT count(*) FROM %s' % (name,)), [(2,)])
+        call_command('compact_events', retention_days=90, verbosity=0)
+        self.assertEqual(
+            self._execute('SELECT to_regclass(%s)', [name]), [(None,)])
+        self.assertEqual(sorted(models.EventDaily.objects.values_list(
+            'day', 'subject', 'count')), sorted([
+                (self._mid_month(old).date(), 'nice', 2),
+                (unpartitioned.date(), 'bad', 1),
+            ]))
+        self.assertEqual(models.Event.objects.count(), 1)
+
+    def test_create_partition(self):
+        # Further ahead than compact_events creates partitions
+        month = partitions.month_start(
+            timezone.now() + datetime.timedelta(days=200))
+        self._event('nice', self._mid_month(month))
+        self.assertEqual(self._execute(
+            'SELECT count(*) FROM %s' % (partitions.DEFAULT,)), [(1,)])
+        name = self._partition(month)
+        # Moved out of the default partition, into its own
+        self.assertEqual(self._execute(
+            'SELECT count(*) FROM %s' % (partitions.DEFAULT,)), [(0,)])
+        self.assertEqual(
+            self._execute('SELECT count(*) FROM %s' % (name,)), [(1,)])
+        self.assertEqual(models.Event.objects.count(), 1)
+
+    def test_introspection(self):
+        with connection.cursor() as cursor:
+            months = partitions.partitions(cursor)
+        tables = connection.introspection.table_names()
+        self.assertIn(partitions.TABLE, tables)
+        self.assertNotIn(partitions.DEFAULT, tables)
+        self.assertNotIn(partitions.partition_name(months[0]), tables)
+
+
+class ExplainMailerTestCase(TestCase):
+    def test_seed_refused(self):
+        with self.assertRaises(CommandError):
+            call_command('explain_mailer', seed=10, verbosity=0)
+        with self.assertRaises(CommandError):
+            call_command(
+                'explain_mailer', seed=10, scratch_db='other', verbosity=0)
+        self.assertEqual(models.Subscription.objects.count(), 0)
+
+
+@override_settings(EMAIL_WORKERS=0)
+class SubscribeTestCase(TestCase):
+    def setUp(self):
+        self.city = models.City.objects.create(
+            name='Fresno', state='CA', population=1, time_zone='UTC')
+        # Cities of the form are queried once per process
+        forms._cities = None
+        self.addCleanup(setattr, forms, '_cities', None)
+
+    def test_subscribe(self):
+        django_mail.outbox = []
+        response = self.client.post('/subscribe/', {
+            'email': 'a@example.com', 'city': str(self.city.id)})
+        subscription = models.Subscription.objects.get(email='a@example.com')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('id=%i' % (subscription.id,), response['Location'])
+        sent, = django_mail.outbox
+        self.assertEqual(sent.to, ['a@example.com'])
+        self.assertEqual(sent.subject, 'Thanks for subcribing.')
+        self.assertIn('Fresno, CA', sent.body)
+
+
+@override_settings(EMAIL_WORKERS=1, EMAIL_QUEUE=1)
+class OutboxTestCase(SimpleTestCase):
+    def setUp(self):
+        # The pool is sized from the settings when first used
+        outbox._executor = None
+        self.addCleanup(setattr, outbox, '_executor', None)
+
+    def test_full(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        busy = outbox.submit(release.wait)
+        queued = outbox.submit(threading.get_ident)
+        # The worker is busy and the queue full, sent in this thread
+        inline = outbox.submit(threading.get_ident)
+        self.assertTrue(inline.done())
+        self.assertEqual(inline.result(), threading.get_ident())
+        release.set()
+        busy.result(timeout=5)
+        self.assertNotEqual(queued.result(timeout=5), threading.get_ident())
+        outbox._executor.shutdown()
+
+    def test_error(self):
+        with self.assertLogs('subscriptions.outbox', 'ERROR') as logs:
+            outbox.submit(lambda: 1 / 0).exception(timeout=5)
+            outbox._executor.shutdown()
+        self.assertIn('ZeroDivisionError', logs.output[0])
+
+
+class StartupTestCase(SimpleTestCase):
+    # Seconds the commands run by the scheduler may spend importing, as
+    # measured by -X importtime: not the wall clock, which depends on the
+    # load of the machine running the tests
+    budget = 1.0
+    # Slow to import, only imported by the commands when needed
+    lazy_modules = ('aiohttp', 'yarl', 'googlemaps', 'numpy')
+    commands = (
+        'send_emails', 'prefetch_weather', 'compact_events', 'populate_cities')
+    # Loads the command as manage.py does, then lists the modules imported
+    script = (
+        'import sys\n'
+        'import django\n'
+        'from django.core.management import ManagementUtility\n'
+        'django.setup()\n'
+        'ManagementUtility([\'manage.py\']).fetch_command(sys.argv[1])\n'
+        'print(\'\\n\'.join(sys.modules))\n'
+    )
+
+    def _start(self, command):
+        '''
+        Load command in a new interpreter, with -X importtime.
+
+        @return   - (seconds spent importing, names of the modules imported)
+        '''
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', self.script, command],
+            cwd=settings.BASE_DIR,
+            env=dict(
+                os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        self.assertEqual(process.returncode, 0, process.stderr)
+        # import time: self [us] | cumulative | name, nested imports indented
+        # under the top level ones
+        elapsed = 0
+        for line in process.stderr.splitlines():
+            fields = line.split('|')
+            if (line.startswith('import time:') and len(fields) == 3
+                    and fields[1].strip().isdigit()
+                    and not fields[2].startswith('  ')):
+                elapsed += int(fields[1]) / 1e6
+        return elapsed, set(process.stdout.split())
+
+    def test_lazy_modules(self):
+        for command in self.commands:
+            _, modules = self._start(command)
+            self.assertIn('django', modules, command)
+            self.assertEqual(
+                modules.intersection(self.lazy_modules), set(), command)
+
+    @unittest.skipIf(sys.version_info < (3, 7), '-X importtime is new in 3.7')
+    def test_import_time(self):
+        for command in self.commands:
+            elapsed, _ = self._start(command)
+            self.assertGreater(elapsed, 0, command)
+            self.assertLess(elapsed, self.budget, command)
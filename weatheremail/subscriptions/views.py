@@ -1,11 +1,11 @@
 import datetime
 import logging
-import yarl
+import urllib.parse
 
 import django
 
 from django.shortcuts import render
-from subscriptions import forms, models, util
+from subscriptions import emailtemplates, forms, models, outbox, util
 
 
 logger = logging.getLogger('__name__')
@@ -18,6 +18,28 @@ def normalize(log_message):
         log_message,)
 
 
+def send_thanks(email, updated, data):
+    '''
+    Send the thank you email of a subscription.
+    Run in the background, see subscriptions.outbox.
+    '''
+    html = emailtemplates.get_template('thanks_email.html').render(data)
+    subject = {
+        True: 'Thanks for updating you subscription.',
+        False: 'Thanks for subcribing.',
+    }
+    message = django.core.mail.EmailMessage(
+        subject=subject[updated],
+        body=html,
+        from_email=django.conf.settings.DEFAULT_FROM_EMAIL,
+        to=[email],
+    )
+    message.content_subtype = 'html'
+    message.send()
+    log_message = 'Email sent to <%s>' % (email)
+    logger.warning(normalize(log_message))
+
+
 def subscribe_we(request):
     '''
     Subscription Form Page for Weather Discount
@@ -45,32 +67,16 @@ def subscribe_we(request):
                     'newsletter': newsletters[subscriber.newsletter].title(),
                     'city': str(subscriber.city),
                 }
-                html = django.template.loader.render_to_string(
-                    'thanks_email.html',
-                    data,
-                )
-                subject = {
-                    True: 'Thanks for updating you subscription.',
-                    False: 'Thanks for subcribing.',
-                }
-                email = django.core.mail.EmailMessage(
-                    subject=subject[updated],
-                    body=html,
-                    from_email=django.conf.settings.DEFAULT_FROM_EMAIL,
-                    to=[subscriber.email],
-                )
-                email.content_subtype = 'html'
-                email.send()
-                log_message = 'Email sent to <%s>' % (subscriber.email)
-                logger.warning(normalize(log_message))
+                # Rendering and sending the email do not hold the response
+                outbox.submit(send_thanks, subscriber.email, updated, data)
                 # redirect to a new URL:
                 params = {
                     'updated': str(updated),
                     'id': subscriber.id,
                 }
-                # use yarl to create query strings to pass to redirected page
+                # query strings to pass to redirected page
                 return django.http.HttpResponseRedirect(
-                    yarl.URL('thanks').with_query(params)
+                    'thanks?%s' % (urllib.parse.urlencode(params),)
                 )
             except django.db.IntegrityError:
                 log_message = '<%s>, WD, %s: Resubscription attempt' % (
@@ -99,7 +105,8 @@ def thanks(request):
     '''
     Thank You Page.
     '''
-    subscription = models.Subscription.objects.get(id=request.GET.get('id'))
+    subscription = models.Subscription.objects.select_related('city').get(
+        id=request.GET.get('id'))
     data = {
         'updated': request.GET.get('updated'),
         'email': subscription.email,
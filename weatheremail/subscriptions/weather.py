@@ -0,0 +1,137 @@
+'''
+Fetching the weather of cities from wunderground, shared by the
+send_emails and prefetch_weather commands.
+
+The cities are fetched concurrently, so the calls are only held back by the
+API limit of the client and not by the latency of each call.
+aiohttp and apis.wunderground are slow to import, so they are only imported
+when fetching.
+'''
+import asyncio
+
+import django
+
+import subscriptions
+
+
+def add_arguments(parser):
+    '''
+    Add the options of the wunderground API limit to a command parser.
+    '''
+    parser.add_argument(
+        '--api-limit',
+        '-l',
+        dest='api_limit',
+        default=10,
+        type=int,
+        help='API call limit per minute',
+    )
+    parser.add_argument(
+        '--quota',
+        '-q',
+        dest='quota',
+        default='local',
+        choices=('local', 'file', 'db'),
+        help=('Where the API call limit is kept: local to this process, '
+            'in a file shared by the processes of this host, or in the '
+            'DB shared by every process'),
+    )
+    parser.add_argument(
+        '--quota-file',
+        dest='quota_file',
+        default='/tmp/weatheremail-wunderground.quota',
+        help='File holding the API call limit for --quota file',
+    )
+    parser.add_argument(
+        '--lease',
+        dest='lease',
+        default=5,
+        type=int,
+        help='API calls leased at once from a shared quota',
+    )
+    parser.add_argument(
+        '--concurrency',
+        '-c',
+        dest='concurrency',
+        default=10,
+        type=int,
+        help='Cities fetched at once',
+    )
+
+
+def quota(kind, api_limit, quota_file):
+    '''
+    Quota of API calls shared with other processes, None for local.
+
+    @param kind         - local, file or db
+    @param api_limit    - API call limit per minute
+    @param quota_file   - file holding the quota, for file
+    '''
+    import apis.wunderground
+    if kind == 'file':
+        return apis.wunderground.FileQuota(quota_file, limit=api_limit)
+    if kind == 'db':
+        return subscriptions.models.ApiQuota.shared(
+            'wunderground', limit=api_limit)
+    return None
+
+
+async def fetch(
+        cities,
+        api_limit,
+        quota=None,
+        lease=5,
+        concurrency=10,
+        fetched=None,
+        failed=None):
+    '''
+    Fetch the conditions and almanac of cities.
+    A city which cannot be fetched (unknown or ambiguous to wunderground,
+    or the call failed) is skipped rather than failing the others.
+
+    @param cities       - list of (name, state)
+    @param api_limit    - API call limit per minute
+    @param quota        - shared quota (see quota), None for local
+    @param lease        - API calls leased at once from a shared quota
+    @param concurrency  - cities fetched at once
+    @param fetched      - called with (index, conditions, almanac) as soon
+                          as each city is fetched (defaults to: None)
+    @param failed       - called with (index, error) for each city skipped
+                          (defaults to: None)
+    @return             - (conditions, almanacs, calls): lists in the
+                          order of cities, None for the cities skipped, and
+                          the number of API calls made
+    '''
+    # Imported here, as they are slow to import
+    import aiohttp
+    import apis.wunderground
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_city(wuclient, index, city, state):
+        query = {'city': city, 'state': state}
+        try:
+            async with semaphore:
+                conditions = await wuclient.get(
+                    feature='conditions', query=query)
+                almanac = await wuclient.get(feature='almanac', query=query)
+        except (apis.wunderground.WunderGroundError,
+                aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if failed is not None:
+                failed(index, e)
+            return None, None
+        if fetched is not None:
+            fetched(index, conditions, almanac)
+        return conditions, almanac
+
+    async with aiohttp.ClientSession() as session:
+        wuclient = apis.wunderground.Client(
+            key=django.conf.settings.WUNDERGROUND_KEY,
+            session=session,
+            limit=api_limit,
+            quota=quota,
+            lease=lease,
+        )
+        results = await asyncio.gather(*(
+            fetch_city(wuclient, i, city, state)
+            for i, (city, state) in enumerate(cities)))
+    return [r[0] for r in results], [r[1] for r in results], wuclient.calls
@@ -0,0 +1,38 @@
+'''
+PostgreSQL backend which also introspects partitioned tables.
+
+Django 1.11 only lists plain tables and views, so once subscriptions_event
+is partitioned (see subscriptions.partitions) flush, and so every
+TransactionTestCase, leaves it out and fails to truncate the tables it
+references.
+'''
+from django.db.backends.base.introspection import TableInfo
+from django.db.backends.postgresql import base, introspection
+
+
+class DatabaseIntrospection(introspection.DatabaseIntrospection):
+    def get_table_list(self, cursor):
+        '''
+        Returns a list of table and view names in the current database,
+        partitioned tables included but not their partitions.
+        '''
+        # relispartition is new in PostgreSQL 10, as partitioning
+        is_partition = 'false'
+        if self.connection.pg_version >= 100000:
+            is_partition = 'c.relispartition'
+        cursor.execute("""
+            SELECT c.relname, c.relkind
+            FROM pg_catalog.pg_class c
+            LEFT JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+            WHERE c.relkind IN ('r', 'v', 'p')
+                AND NOT %s
+                AND n.nspname NOT IN ('pg_catalog', 'pg_toast')
+                AND pg_catalog.pg_table_is_visible(c.oid)""" % (
+            is_partition,))
+        return [TableInfo(row[0], {'r': 't', 'p': 't', 'v': 'v'}.get(row[1]))
+                for row in cursor.fetchall()
+                if row[0] not in self.ignored_tables]
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    introspection_class = DatabaseIntrospection
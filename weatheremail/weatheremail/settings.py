@@ -42,11 +42,27 @@ EMAIL_HOST_PASSWORD = parser.get('email', 'password')
 EMAIL_HOST_USER = parser.get('email', 'user')
 EMAIL_PORT = parser.get('email', 'port')
 EMAIL_USE_TLS = parser.get('email', 'use_tls')
+# Threads sending the emails of the web pages in the background
+# (see subscriptions.outbox), 0 to send them while handling the request
+EMAIL_WORKERS = parser.getint('email', 'workers', fallback=4)
+# Emails waiting for a worker at most, past which they are sent while
+# handling the request
+EMAIL_QUEUE = parser.getint('email', 'queue', fallback=100)
+
+# Weather classification of the weather discount email
+# (see subscriptions.classify)
+WEATHER_THRESHOLD_F = parser.getfloat(
+    'weather', 'threshold_f', fallback=5.0)
+WEATHER_BAD = tuple(w.strip().lower() for w in parser.get(
+    'weather', 'bad', fallback='overcast, rain').split(','))
+WEATHER_NICE = tuple(w.strip().lower() for w in parser.get(
+    'weather', 'nice', fallback='clear').split(','))
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = parser.getboolean('main', 'debug', fallback=True)
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host.strip() for host in parser.get(
+    'main', 'allowed_hosts', fallback='').split(',') if host.strip()]
 
 
 # Application definition
@@ -75,11 +91,20 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'weatheremail.urls'
 
+template_loaders = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    # Production: templates are read and compiled once per process
+    template_loaders = [
+        ('django.template.loaders.cached.Loader', template_loaders),
+    ]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': ['/subscriptions/templates'],
-        'APP_DIRS': True,
+        'DIRS': [],
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -87,6 +112,8 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'debug': DEBUG,
+            'loaders': template_loaders,
         },
     },
 ]
@@ -99,7 +126,8 @@ WSGI_APPLICATION = 'weatheremail.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        # Django's PostgreSQL backend, also seeing the partitioned event table
+        'ENGINE': 'weatheremail.postgresql',
         'NAME': parser.get('db', 'name'),
         'USER': parser.get('db', 'user'),
         'PASSWORD': parser.get('db', 'password'),